@@ -1,14 +1,78 @@
 import sys
 import json
-from flask import Flask, request, jsonify
+import logging
+import random
+import threading
+import time
+# Cold-start timing includes the imports below
+_started_at = time.perf_counter()
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from engine.ast_builder import create_rule, combine_rules, Node
-from db.models import store_rule, retrieve_rule, get_all_rules, delete_rule
-from engine.evaluator import evaluate  # Ensure this matches the function name in evaluator.py
+from engine.ast_builder import create_rule, combine_rules, serialize_ast
+from db.bulk import import_rules, export_lines, read_entries
+from db.config import load_config
+from db.jobs import JobStore
+from db.snapshot import read_snapshot, snapshot_version, write_snapshot
+from db.models import (store_rule, delete_rule, retrieve_rule_version,
+                       get_rule_version, get_rule_versions, on_rule_change,
+                       match_rows, count_matches, list_rules, iter_rule_names, rules_version)
+from engine.jobs import JobQueue, QueueFull
+from engine.metrics import metrics
+from engine.partial import is_constant
+from engine.result_cache import ResultCache, referenced_fields
+from engine.schema import SchemaError, SchemaRegistry
+from engine.rule_cache import PreparedRule, RuleCache
+from engine.rule_index import RuleIndex
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Compiled rules are cached per process; local writes invalidate entries
+# immediately and other workers' writes are noticed on revalidation
+config = load_config()
+
+# Field schemas: rules are checked against one when created, and records are
+# decoded with it (types checked and coerced once) before evaluation
+schemas = SchemaRegistry.from_file(config['schema_path']) if config['schema_path'] else SchemaRegistry()
+rule_cache = RuleCache(
+    retrieve_rule_version,
+    get_rule_version,
+    max_size=config['rule_cache_size'],
+    revalidate_after=config['rule_cache_revalidate_seconds']
+)
+on_rule_change(rule_cache.invalidate)
+
+# Optional cache of rule results keyed on the fields each rule reads;
+# disabled unless RESULT_CACHE_SIZE is set
+result_cache = ResultCache(
+    max_size=config['result_cache_size'],
+    ttl=config['result_cache_ttl_seconds'],
+    rules=config['result_cache_rules']
+)
+on_rule_change(result_cache.invalidate)
+
+# Index over all stored rules for /match_rules, built on first use and then
+# kept up to date one rule at a time
+rule_index = RuleIndex()
+_rule_index_lock = threading.Lock()
+_rule_index_synced_at = None
+
+# Background evaluation jobs, kept in a local SQLite file (JOB_STORE_PATH) so
+# queued and unfinished jobs are picked up again after a restart. The worker
+# threads start with the first request, not on import
+job_queue = JobQueue(
+    JobStore(config['job_store_path']),
+    rule_cache.get,
+    schemas,
+    workers=config['job_workers'],
+    max_queued=config['job_queue_max'],
+    input_dir=config['job_input_dir'],
+    chunk_size=config['job_chunk_size'],
+    lease=config['job_lease_seconds']
+)
+
 @app.route('/routes', methods=['GET'])
 def list_routes():
     output = []
@@ -22,12 +86,16 @@ def create_rule_api():
     try:
         rule_string = request.json['rule']
         rule_name = request.json.get('rule_name', 'default_rule_name')
-        print(f"Creating rule: {rule_name} with string: {rule_string}")  # Debug output
+        schema, error = _request_schema(request.json)
+        if error:
+            return error
         rule_ast = create_rule(rule_string)
+        schema.check_rule(rule_ast)
         store_rule(rule_name, rule_string, rule_ast)
         return jsonify({'message': 'Rule created successfully', 'rule_name': rule_name}), 201
+    except SchemaError as e:
+        return _schema_error(e)
     except Exception as e:
-        print(f"Error in creating rule: {e}")  # Debug output
         return jsonify({'error': str(e)}), 400
 
 # Endpoint to combine multiple rules into a single AST and store it
@@ -38,15 +106,22 @@ def combine_rules_api():
         if not isinstance(rules, list) or not all(isinstance(rule, str) for rule in rules):
             return jsonify({'error': 'Invalid input format. Expected a list of rule strings.'}), 400
 
+        schema, error = _request_schema(request.json)
+        if error:
+            return error
         combined_ast = combine_rules(rules)
+        schema.check_rule(combined_ast)
         combined_rule_name = request.json.get('combined_rule_name', 'default_combined_rule')
         
-        store_rule(combined_rule_name, ' AND '.join(rules), combined_ast)
+        # Stored as a rule string that parses to the same rule
+        store_rule(combined_rule_name, ' and '.join(f'({rule})' for rule in rules), combined_ast)
         
         return jsonify({
             'combined_ast': combined_ast.to_dict(),
             'message': f'Combined rule stored as {combined_rule_name}'
         }), 200
+    except SchemaError as e:
+        return _schema_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -64,44 +139,418 @@ def evaluate_rule_api():
     if not rule_id or not input_data:
         return jsonify({'error': 'Rule ID and input data are required'}), 400
 
-    # Check if the expected keys exist in input_data
-    required_keys = ['age', 'income', 'department']
-    missing_keys = [key for key in required_keys if key not in input_data]
-    if missing_keys:
-        return jsonify({'error': f'Missing keys in input data: {", ".join(missing_keys)}'}), 400
-
-    # Fetch the rule AST from the database
-    print(f"Retrieving rule '{rule_id}' from the database")
-    rule_ast = retrieve_rule(rule_id)
-    
-    # Ensure rule_ast is a Node instance, if not, convert it
-    if isinstance(rule_ast, str):  # If it’s a string, you may need to parse it
-        rule_ast = Node.from_dict(json.loads(rule_ast))  # Assuming the string is in JSON format
-
-    if rule_ast is None or not isinstance(rule_ast, Node):
+    # Check and coerce the record once, before the rule runs
+    schema, error = _request_schema(data)
+    if error:
+        return error
+    try:
+        input_data = schema.decode(input_data)
+    except SchemaError as e:
+        return _schema_error(e)
+
+    # Fetch the compiled rule from the cache (or the database on a miss)
+    predicate = _load_rule(rule_id)
+    if predicate is None:
         return jsonify({'error': 'Rule not found or invalid AST'}), 404
 
+    trace_requested = _trace_requested(data)
+    trace = [] if trace_requested or _trace_sampled() else None
+    start = time.perf_counter()
+    try:
+        # Run the compiled rule on the provided data
+        result = _run_rule(predicate, input_data, trace, schema)
+    except Exception as e:
+        metrics.record_evaluation(rule_id, time.perf_counter() - start, error=True)
+        _log_trace(rule_id, trace)
+        body = {'error': _evaluation_error(e)}
+        if trace_requested:
+            body['trace'] = trace
+        return jsonify(body), 400
+    metrics.record_evaluation(rule_id, time.perf_counter() - start)
+    _log_trace(rule_id, trace)
+
+    body = {'result': result}
+    if trace_requested:
+        body['trace'] = trace
+    return jsonify(body), 200
+
+# Endpoint to evaluate one rule against a stream of NDJSON records.
+# The rule is loaded once; results are streamed back one line per record.
+@app.route('/evaluate_batch', methods=['POST'])
+def evaluate_batch_api():
+    rule_id = request.args.get('rule_id')
+    if not rule_id:
+        return jsonify({'error': 'Rule ID is required'}), 400
+
+    schema, error = _request_schema()
+    if error:
+        return error
+
+    predicate = _load_rule(rule_id)
+    if predicate is None:
+        return jsonify({'error': 'Rule not found or invalid AST'}), 404
+
+    trace_requested = _trace_requested()
+
+    def generate():
+        # Read the body line by line so memory stays bounded
+        for line_number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            trace = [] if trace_requested or _trace_sampled() else None
+            result = _evaluate_record(rule_id, predicate, schema, line, line_number, trace)
+            if trace_requested:
+                result['trace'] = trace
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _evaluate_record(rule_id, predicate, schema, line, line_number, trace=None):
+    # Errors are reported per record so one bad line does not stop the batch
     try:
-        print(f"Evaluating rule '{rule_id}' with data: {input_data}")
-        # Evaluate the rule with the provided data
-        result = evaluate(rule_ast, input_data)
-        return jsonify({'result': result}), 200
+        input_data = json.loads(line)
     except ValueError as e:
-        return jsonify({'error': f'Value error: {str(e)}'}), 400
-    except TypeError as e:
-        return jsonify({'error': f'Type error: {str(e)}'}), 400
+        return {'line': line_number, 'error': f'Invalid JSON: {str(e)}'}
+
+    if not isinstance(input_data, dict) or not input_data:
+        return {'line': line_number, 'error': 'Input data must be a non-empty JSON object'}
+
+    try:
+        input_data = schema.decode(input_data)
+    except SchemaError as e:
+        return {'line': line_number, 'error': str(e), 'errors': e.errors}
+
+    start = time.perf_counter()
+    try:
+        result = _run_rule(predicate, input_data, trace, schema)
     except Exception as e:
-        return jsonify({'error': f'An error occurred during evaluation: {str(e)}'}), 400
+        metrics.record_evaluation(rule_id, time.perf_counter() - start, error=True)
+        _log_trace(rule_id, trace)
+        return {'line': line_number, 'error': _evaluation_error(e)}
+    metrics.record_evaluation(rule_id, time.perf_counter() - start)
+    _log_trace(rule_id, trace)
+    return {'line': line_number, 'result': result}
+
+# Endpoint to find every stored rule that a record satisfies
+@app.route('/match_rules', methods=['POST'])
+def match_rules_api():
+    input_data = request.json.get('data')
+    if not input_data or not isinstance(input_data, dict):
+        return jsonify({'error': 'Input data is required'}), 400
+
+    schema, error = _request_schema(request.json)
+    if error:
+        return error
+    try:
+        input_data = schema.decode(input_data)
+    except SchemaError as e:
+        return _schema_error(e)
+
+    _sync_rule_index()
+    return jsonify({'matches': rule_index.match(input_data)}), 200
+
+# Endpoint to run a stored rule against a database table. The rule is
+# translated to SQL, so only matching rows leave the database; rows the rule
+# would raise on (e.g. a NULL field) do not match. Only the tables listed in
+# MATCH_TABLES can be matched.
+@app.route('/match_table', methods=['POST'])
+def match_table_api():
+    data = request.json or {}
+    rule_id = data.get('rule_id')
+    table = data.get('table')
+    limit = data.get('limit')
+    if not rule_id or not isinstance(table, str) or not table:
+        return jsonify({'error': 'Rule ID and table are required'}), 400
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+        return jsonify({'error': 'limit must be a non-negative integer'}), 400
+    if table not in config['match_tables']:
+        return jsonify({'error': f"Table '{table}' is not in MATCH_TABLES"}), 403
+
+    rule = _load_rule(str(rule_id))
+    if rule is None:
+        return jsonify({'error': 'Rule not found or invalid AST'}), 404
+
+    try:
+        if data.get('count'):
+            # Same plan as /evaluate_rule, so errors match it too
+            result = count_matches(table, rule.plan, count_errors=bool(data.get('count_errors')))
+        else:
+            result = match_rows(table, rule.plan, limit)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    if result is None:
+        return jsonify({'error': 'Database error while matching the table'}), 500
+
+    if data.get('count'):
+        return jsonify(result), 200
+    return jsonify({'rows': result, 'count': len(result)}), 200
+
+# Endpoint to specialize a stored rule to known field values, e.g. a
+# tenant's fixed department. Returns the residual rule over the remaining
+# fields; when it is constant, records need not be evaluated at all.
+@app.route('/partial_evaluate', methods=['POST'])
+def partial_evaluate_api():
+    data = request.json or {}
+    rule_id = data.get('rule_id')
+    context = data.get('context')
+    if not rule_id or not isinstance(context, dict):
+        return jsonify({'error': 'Rule ID and context are required'}), 400
+
+    rule = _load_rule(str(rule_id))
+    if rule is None:
+        return jsonify({'error': 'Rule not found or invalid AST'}), 404
+
+    residual = rule.residual(context)
+    return jsonify({
+        'rule_id': rule.rule_name,
+        'version': rule.version,
+        'residual': serialize_ast(residual),
+        'constant': bool(residual.value) if is_constant(residual) else None,
+        'fields': list(referenced_fields(residual)),
+    }), 200
+
+def _sync_rule_index():
+    # Reload only the rules whose version changed; other workers' changes
+    # are picked up within the cache revalidation interval
+    global _rule_index_synced_at
+    now = time.monotonic()
+    if (_rule_index_synced_at is not None
+            and now - _rule_index_synced_at < config['rule_cache_revalidate_seconds']):
+        return
+    with _rule_index_lock:
+        versions = get_rule_versions()
+        if versions is None:
+            return
+        for rule_name in rule_index.rule_names():
+            if rule_name not in versions:
+                rule_index.remove_rule(rule_name)
+        for rule_name, version in versions.items():
+            if rule_index.version(rule_name) != version:
+                _reindex_rule(rule_name)
+        _rule_index_synced_at = now
+
+def _reindex_rule(rule_name):
+    loaded = retrieve_rule_version(rule_name)
+    if loaded is None:
+        rule_index.remove_rule(rule_name)
+    else:
+        rule_index.add_rule(rule_name, loaded[0], version=loaded[1])
+
+@on_rule_change
+def _update_rule_index(rule_name):
+    # Local writes update the index straight away once it has been built
+    if _rule_index_synced_at is not None:
+        with _rule_index_lock:
+            _reindex_rule(rule_name)
+
+def _request_schema(body=None):
+    # Schema named by ?schema= or "schema" in the body, else the default;
+    # returns (schema, None) or (None, error response)
+    name = request.args.get('schema')
+    if name is None and isinstance(body, dict):
+        name = body.get('schema')
+    schema = schemas.get(name)
+    if schema is None:
+        return None, (jsonify({'error': f"Unknown schema '{name}'"}), 400)
+    return schema, None
+
+def _schema_error(e):
+    return jsonify({'error': str(e), 'errors': e.errors}), 400
+
+def _load_rule(rule_id):
+    # Return the cached compiled rule, or None if it does not exist
+    return rule_cache.get(rule_id)
+
+def _run_rule(rule, input_data, trace, schema):
+    # Traced runs walk the optimized tree node by node; untraced runs use
+    # the rule compiled for the schema's decoded records, through the
+    # result cache
+    if trace is None:
+        return result_cache.evaluate(rule, input_data, rule.for_schema(schema), schema.name)
+    return rule.evaluate_traced(input_data, trace, schema)
+
+def _trace_requested(body=None):
+    # Tracing is off by default; enable it with ?trace=1 or "trace": true
+    if request.args.get('trace', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return isinstance(body, dict) and body.get('trace') is True
+
+def _trace_sampled():
+    rate = config['trace_sample_rate']
+    return rate > 0 and random.random() < rate
+
+def _log_trace(rule_id, trace):
+    if trace is not None:
+        logger.info("Evaluation trace for rule '%s': %s", rule_id, json.dumps(trace, default=str))
+
+def _evaluation_error(e):
+    if isinstance(e, ValueError):
+        return f'Value error: {str(e)}'
+    elif isinstance(e, TypeError):
+        return f'Type error: {str(e)}'
+    return f'An error occurred during evaluation: {str(e)}'
+
+
+# Endpoint exposing per-rule evaluation counts and latencies, database
+# time, and cache and index statistics
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    snapshot = metrics.snapshot()
+    snapshot['rule_cache'] = rule_cache.stats()
+    snapshot['result_cache'] = result_cache.stats()
+    snapshot['rule_index'] = rule_index.stats()
+    snapshot['jobs'] = job_queue.stats()
+    return jsonify(snapshot), 200
+
+# Endpoint to create or replace many rules at once. Takes {"rules": [{"rule_name":
+# ..., "rule": ...}, ...]} or the same objects as NDJSON lines (e.g. the output
+# of /export_rules). Nothing is stored if any rule is invalid, unless
+# skip_invalid is set (?skip_invalid=1 or "skip_invalid": true).
+@app.route('/import_rules', methods=['POST'])
+def import_rules_api():
+    skip_invalid = request.args.get('skip_invalid', '').lower() in ('1', 'true', 'yes')
+    body = None
+    if request.mimetype == 'application/json':
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('rules'), list):
+            return jsonify({'error': 'Expected {"rules": [...]} or NDJSON lines'}), 400
+        entries = body['rules']
+        skip_invalid = skip_invalid or body.get('skip_invalid') is True
+    else:
+        entries = read_entries(request.stream)
+
+    schema, error = _request_schema(body)
+    if error:
+        return error
+    # Parsed in this process: forking a parser pool from a threaded server
+    # (database pool, job workers) can deadlock the children
+    report, stored = import_rules(entries, skip_invalid=skip_invalid, workers=1, schema=schema)
+    if not stored:
+        report['error'] = 'The rules could not be written to the database'
+        return jsonify(report), 500
+    if report['errors'] and not skip_invalid:
+        return jsonify(report), 400
+    return jsonify(report), 200
+
+# Endpoint listing the field schemas rules and records are checked against
+@app.route('/schemas', methods=['GET'])
+def schemas_api():
+    return jsonify(schemas.to_dict()), 200
+
+# Endpoint streaming every rule, with its AST and version, as NDJSON
+@app.route('/export_rules', methods=['GET'])
+def export_rules_api():
+    return Response(stream_with_context(export_lines()), mimetype='application/x-ndjson')
 
+# Largest page /get_all_rules returns
+MAX_PAGE_SIZE = 1000
 
-# Endpoint to get a list of all rule names
+# Endpoint to list rule names in name order. ?limit=N returns one page and
+# the name to pass as ?after= for the next; ?prefix= filters by name prefix.
+# Without limit every name is streamed. The ETag is the rules table version,
+# so a poll with If-None-Match gets 304 until a rule changes.
 @app.route('/get_all_rules', methods=['GET'])
 def get_all_rules_api():
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    prefix = request.args.get('prefix')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    version = rules_version()
+    etag = f'rules-{version}' if version is not None else None
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif limit is None:
+        response = Response(stream_with_context(_stream_rule_names(after, prefix)), mimetype='application/json')
+    else:
+        names = list_rules(limit, after, prefix)
+        if names is None:
+            return jsonify({'error': 'Could not read the rules'}), 500
+        response = jsonify({'rules': names, 'next_after': names[-1] if len(names) == limit else None})
+
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Endpoint to queue a batch evaluation job: {"rule_ids": [...], "records":
+# [...]} or {"rule_ids": [...], "input_path": "file under JOB_INPUT_DIR"}.
+# Returns 202 with the job id at once, or 429 when the queue is full.
+@app.route('/jobs', methods=['POST'])
+def submit_job_api():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
     try:
-        rules = get_all_rules()  # Get all rule names
-        return jsonify({'rules': rules}), 200
-    except Exception as e:
+        job_id = job_queue.submit(data.get('rule_ids'), data.get('records'), data.get('input_path'),
+                                  data.get('schema'))
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+# Endpoint reporting a job's status and progress with one page of its
+# results (?offset=, ?limit= up to MAX_PAGE_SIZE, default 100)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_api(job_id):
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        offset = limit = -1
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'offset must be non-negative and limit between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    job = job_queue.store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    results = job_queue.store.results(job_id, offset, limit)
+    total = job['total']
+    if total:
+        progress = round(100.0 * job['processed'] / total, 1)
+    else:
+        progress = 100.0 if job['status'] == 'succeeded' else 0.0
+    next_offset = offset + len(results)
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'rule_ids': job['spec']['rule_ids'],
+        'progress': progress,
+        'processed': job['processed'],
+        'total': total,
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'results': results,
+        'next_offset': next_offset if next_offset < job['processed'] else None,
+    }), 200
+
+# Endpoint to cancel a queued or running job; results stored so far are kept
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_api(job_id):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job_id': job_id, 'status': status}), 200
+
+def _stream_rule_names(after, prefix):
+    # {"rules": [...]} written a name at a time from a server-side cursor
+    yield '{"rules": ['
+    first = True
+    for name in iter_rule_names(prefix, after):
+        yield ('' if first else ', ') + json.dumps(name)
+        first = False
+    yield ']}'
 
 # Endpoint to delete a rule by name
 @app.route('/delete_rule', methods=['DELETE'])
@@ -118,8 +567,6 @@ def modify_rule_api():
     try:
         rule_name = request.json['rule_name']
         new_rule_string = request.json['new_rule']  # Expecting the modified rule string
-        
-        print(f"Modifying rule: {rule_name} to new rule: {new_rule_string}")  # Debug output
 
         # Validate new rule
         if not is_valid_rule(new_rule_string):
@@ -130,10 +577,16 @@ def modify_rule_api():
             new_rule_ast = create_rule(new_rule_string)  # Create AST from the new rule
         except SyntaxError as se:
             return jsonify({'error': f'Syntax error in rule: {str(se)}'}), 400
-        
+
+        schema, error = _request_schema(request.json)
+        if error:
+            return error
+        schema.check_rule(new_rule_ast)
         store_rule(rule_name, new_rule_string, new_rule_ast)  # Update the rule in the database
         
         return jsonify({'message': 'Rule modified successfully', 'rule_name': rule_name}), 200
+    except SchemaError as e:
+        return _schema_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -142,9 +595,43 @@ def is_valid_rule(rule_string):
     valid_operators = ['>', '<', '>=', '<=', '==', '!=']
     return any(op in rule_string for op in valid_operators)
 
-# Print all registered routes for debugging
-for rule in app.url_map.iter_rules():
-    print(rule)
+def _warm_rule_cache(path):
+    # Fill the rule cache from the snapshot before serving, rebuilding the
+    # snapshot first if the rules table changed since it was written
+    start = time.perf_counter()
+    current = rules_version()
+    if current is None:
+        logger.warning("Rules version unavailable; not loading the rule snapshot")
+        return
+    rebuilt = False
+    try:
+        if snapshot_version(path) != current:
+            rebuilt = write_snapshot(path) is not None
+        version, rules = read_snapshot(path, limit=rule_cache.max_size)
+    except Exception as e:
+        logger.warning(f"Rule snapshot {path} could not be used: {e}")
+        return
+    preloaded = rule_cache.preload(PreparedRule(rule_name, rule_version, ast, plan)
+                                   for rule_name, rule_version, ast, plan in rules)
+    seconds = time.perf_counter() - start
+    metrics.record_startup(snapshot_seconds=seconds, snapshot_version=version,
+                           snapshot_rebuilt=rebuilt, rules_preloaded=preloaded)
+    logger.info(f"Preloaded {preloaded} rules from {path} (version {version}"
+                f"{', rebuilt' if rebuilt else ''}) in {seconds:.3f}s")
+
+_first_request_seen = False
+
+@app.before_request
+def _record_first_request():
+    global _first_request_seen
+    if not _first_request_seen:
+        _first_request_seen = True
+        metrics.record_startup(first_request_seconds=time.perf_counter() - _started_at)
+        job_queue.start()
+
+if config['snapshot_path']:
+    _warm_rule_cache(config['snapshot_path'])
+metrics.record_startup(ready_seconds=time.perf_counter() - _started_at)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,57 @@
+"""Compare evaluate_frame against per-row evaluation of the same records.
+
+Run with ``python -m bench.frame [--rows N]``.
+"""
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+from engine.ast_builder import Node
+from engine.compiler import compile_rule
+from engine.vectorized import evaluate_frame
+
+# ((age > 30 and department == 'Sales') or (income > 50000))
+RULE = Node('operator', value='OR',
+            left=Node('operator', value='AND',
+                      left=Node('operand', value='age > 30'),
+                      right=Node('operand', value="department == 'Sales'")),
+            right=Node('operand', value='income > 50000'))
+
+
+def make_frame(rows, seed=0):
+    rng = random.Random(seed)
+    departments = ['Sales', 'HR', 'Marketing', 'Engineering']
+    return pd.DataFrame({
+        'age': [rng.randint(18, 65) for _ in range(rows)],
+        'income': [rng.randint(10000, 100000) for _ in range(rows)],
+        'department': [rng.choice(departments) for _ in range(rows)],
+    })
+
+
+def run(rows):
+    df = make_frame(rows)
+    records = df.to_dict('records')
+    predicate = compile_rule(RULE)
+
+    start = time.perf_counter()
+    row_results = np.array([predicate(record) for record in records], dtype=bool)
+    row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mask = evaluate_frame(RULE, df)
+    frame_time = time.perf_counter() - start
+
+    if not np.array_equal(mask, row_results):
+        raise AssertionError("evaluate_frame disagrees with per-row evaluation")
+
+    print(f"rows:             {rows}")
+    print(f"per-row compiled: {row_time:.3f}s ({rows / row_time:,.0f} rows/s)")
+    print(f"evaluate_frame:   {frame_time:.3f}s ({rows / frame_time:,.0f} rows/s)")
+    print(f"speedup:          {row_time / frame_time:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    run(parser.parse_args().rows)
@@ -0,0 +1,65 @@
+"""Compare IncrementalEvaluator.update with re-evaluating the whole record.
+
+Keeps a set of synthetic records, applies single-field updates to them and
+times re-running every rule from scratch (SharedRuleSet.evaluate) against
+IncrementalEvaluator.update, checking that both report the same outcomes.
+
+Run with ``python -m bench.incremental [--rules N] [--records N] [--updates N]``.
+"""
+import argparse
+import random
+import time
+from bench.synthetic import RuleSpec, make_records, make_rule_strings
+from engine.ast_builder import create_rule
+from engine.dag import SharedRuleSet
+from engine.incremental import IncrementalEvaluator
+from engine.optimizer import optimize_rule
+
+
+def run(rules_count, records_count, updates_count, seed=0):
+    spec = RuleSpec(depth=2, width=3, int_fields=8, str_fields=4)
+    rules = {f'rule_{i}': create_rule(rule_string)
+             for i, rule_string in enumerate(make_rule_strings(spec, rules_count, seed=seed))}
+    records = make_records(spec, records_count, seed=seed + 1)
+    rng = random.Random(seed + 2)
+    fields = spec.int_fields
+    updates = [(rng.randrange(records_count), rng.choice(fields), rng.randint(0, 100000))
+               for _ in range(updates_count)]
+
+    full = SharedRuleSet()
+    for rule_name, ast in rules.items():
+        full.add_rule(rule_name, optimize_rule(ast))
+    incremental = IncrementalEvaluator(rules)
+    for record_id, record in enumerate(records):
+        incremental.add_record(record_id, record)
+
+    full_records = [dict(record) for record in records]
+    start = time.perf_counter()
+    full_results = []
+    for record_id, field, value in updates:
+        full_records[record_id][field] = value
+        full_results.append(full.evaluate(full_records[record_id]))
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for record_id, field, value in updates:
+        incremental.update(record_id, {field: value})
+    incremental_time = time.perf_counter() - start
+
+    for record_id, record in enumerate(full_records):
+        if repr(incremental.results(record_id)) != repr(full.evaluate(record)):
+            raise AssertionError(f"record {record_id}: incremental results disagree")
+
+    print(f"rules: {rules_count}, records: {records_count}, updates: {updates_count}")
+    print(f"full re-evaluation: {full_time:.3f}s ({updates_count / full_time:,.0f} updates/s)")
+    print(f"incremental:        {incremental_time:.3f}s ({updates_count / incremental_time:,.0f} updates/s)")
+    print(f"speedup:            {full_time / incremental_time:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--updates', type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.rules, args.records, args.updates)
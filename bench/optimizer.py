@@ -0,0 +1,79 @@
+"""Measure what optimize_rule saves on deep combined rules.
+
+Builds a rule by AND-ing many sub-rules (with repeated clauses, as
+combine_rules produces) and times compiled evaluation of the rule as
+written, after optimize_rule with estimated selectivity, and after
+optimize_rule with selectivity measured on a sample. Records are decoded
+with the default schema, under which every check may be reordered.
+
+Run with ``python -m bench.optimizer [--rules N] [--records N]``.
+"""
+import argparse
+import random
+import time
+from engine.ast_builder import Node
+from engine.compiler import compile_rule
+from engine.optimizer import optimize_rule, measure_selectivity
+from engine.schema import SchemaRegistry
+
+DEPARTMENTS = ['Sales', 'HR', 'Marketing', 'Engineering']
+
+
+def make_rule(sub_rules, seed=0):
+    rng = random.Random(seed)
+    rule = None
+    for _ in range(sub_rules):
+        # (age > A AND department == D) OR income > I
+        sub_rule = Node('operator', value='OR',
+                        left=Node('operator', value='AND',
+                                  left=Node('operand', value=f'age > {rng.choice([20, 25, 30])}'),
+                                  right=Node('operand', value=f"department == '{rng.choice(DEPARTMENTS)}'")),
+                        right=Node('operand', value=f'income > {rng.choice([20000, 50000, 80000])}'))
+        rule = sub_rule if rule is None else Node('operator', value='AND', left=rule, right=sub_rule)
+    return rule
+
+
+def make_records(count, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'age': rng.randint(18, 65),
+        'income': rng.randint(10000, 100000),
+        'department': rng.choice(DEPARTMENTS),
+    } for _ in range(count)]
+
+
+def time_predicate(predicate, records):
+    start = time.perf_counter()
+    results = [predicate(record) for record in records]
+    return time.perf_counter() - start, results
+
+
+def run(sub_rules, records_count):
+    schema = SchemaRegistry().get()
+    rule = make_rule(sub_rules)
+    records = [schema.decode(record) for record in make_records(records_count)]
+    sample = records[:1000]
+
+    variants = [
+        ('as written', rule),
+        ('optimized (estimates)', optimize_rule(rule, schema=schema)),
+        ('optimized (measured)', optimize_rule(rule, measure_selectivity(rule, sample), schema=schema)),
+    ]
+
+    baseline = None
+    print(f"sub-rules: {sub_rules}, records: {records_count}")
+    for name, ast in variants:
+        elapsed, results = time_predicate(compile_rule(ast, schema), records)
+        if baseline is None:
+            baseline = (elapsed, results)
+        elif results != baseline[1]:
+            raise AssertionError(f"{name} disagrees with the rule as written")
+        print(f"{name:24} {elapsed:.3f}s  {baseline[0] / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=50)
+    parser.add_argument('--records', type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.rules, args.records)
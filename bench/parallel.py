@@ -0,0 +1,56 @@
+"""Measure how evaluate_parallel scales from 1 to N worker processes.
+
+Scores a synthetic record set against a synthetic rule set with 1, 2, ...
+up to --max-workers processes, checks every run against single-process
+evaluation, and prints the time and speedup of each.
+
+Run with ``python -m bench.parallel [--records N] [--rules N] [--max-workers N]``.
+"""
+import argparse
+import os
+import time
+from bench.synthetic import RuleSpec, make_records, make_rule_strings
+from engine.ast_builder import create_rule
+from engine.dag import SharedRuleSet
+from engine.optimizer import optimize_rule
+from engine.parallel import evaluate_parallel
+
+
+def _comparable(results):
+    # Exceptions do not compare equal across processes; compare their text
+    return [{name: repr(value) if isinstance(value, Exception) else value
+             for name, value in row.items()} for row in results]
+
+
+def run(records_count, rules_count, max_workers, chunk_size):
+    spec = RuleSpec(depth=2, width=3)
+    rules = {f'rule_{i}': create_rule(rule_string)
+             for i, rule_string in enumerate(make_rule_strings(spec, rules_count))}
+    records = make_records(spec, records_count)
+
+    serial = SharedRuleSet()
+    for rule_name, ast in rules.items():
+        serial.add_rule(rule_name, optimize_rule(ast))
+    start = time.perf_counter()
+    expected = _comparable([serial.evaluate(record) for record in records])
+    serial_time = time.perf_counter() - start
+
+    print(f"records: {records_count}, rules: {rules_count}, chunk size: {chunk_size}")
+    print(f"{'in-process':12} {serial_time:8.3f}s")
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        results = evaluate_parallel(rules, records, workers=workers, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        if _comparable(results) != expected:
+            raise AssertionError(f"{workers} workers disagree with in-process evaluation")
+        print(f"{workers:2} workers   {elapsed:8.3f}s  {serial_time / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=50_000)
+    parser.add_argument('--rules', type=int, default=50)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.records, args.rules, args.max_workers, args.chunk_size)
@@ -0,0 +1,211 @@
+"""Benchmark suite for rule parsing, (de)serialization, evaluation and the API.
+
+Times create_rule, Node.to_dict / Node.from_dict, evaluate, the compiled
+rules the API runs, and the /create_rule and /evaluate_rule endpoints
+through Flask's test client against an in-memory SQLite store, all on
+seeded synthetic rules and records. Needs no database server.
+
+Each benchmark is run --repeat times and the fastest run is kept.
+Results can be saved as a JSON baseline and later runs compared with it;
+the run fails (exit status 1) when a benchmark is slower than its
+baseline by more than --threshold.
+
+    python -m bench.suite --save bench/baseline.json
+    python -m bench.suite --compare bench/baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from bench.synthetic import RuleSpec, make_records, make_rule_strings
+from engine.ast_builder import Node, create_rule
+from engine.evaluator import evaluate
+from engine.rule_cache import PreparedRule
+
+
+def time_best(run, ops, repeat):
+    # Seconds per operation of the fastest of `repeat` runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / ops
+
+
+def bench_engine(rule_strings, records, repeat):
+    asts = [create_rule(rule_string) for rule_string in rule_strings]
+    dicts = [ast.to_dict() for ast in asts]
+    prepared = [PreparedRule(f'rule_{i}', 1, ast) for i, ast in enumerate(asts)]
+    evaluations = len(asts) * len(records)
+
+    def parse():
+        for rule_string in rule_strings:
+            create_rule(rule_string)
+
+    def to_dict():
+        for ast in asts:
+            ast.to_dict()
+
+    def from_dict():
+        for data in dicts:
+            Node.from_dict(data)
+
+    def run_evaluate():
+        for ast in asts:
+            for record in records:
+                evaluate(ast, record)
+
+    def run_compiled():
+        for rule in prepared:
+            for record in records:
+                rule(record)
+
+    return {
+        'create_rule': (time_best(parse, len(asts), repeat), len(asts)),
+        'to_dict': (time_best(to_dict, len(asts), repeat), len(asts)),
+        'from_dict': (time_best(from_dict, len(asts), repeat), len(asts)),
+        'evaluate': (time_best(run_evaluate, evaluations, repeat), evaluations),
+        'evaluate_compiled': (time_best(run_compiled, evaluations, repeat), evaluations),
+    }
+
+
+def bench_http(spec, rule_strings, records, requests_count, repeat):
+    # The app reads its configuration on import, so point it at an
+    # in-memory store first
+    os.environ['RULE_STORE_BACKEND'] = 'sqlite'
+    os.environ['RULE_STORE_SQLITE_PATH'] = ':memory:'
+    os.environ['TRACE_SAMPLE_RATE'] = '0'
+    os.environ['JOB_STORE_PATH'] = ':memory:'
+    os.environ['JOB_WORKERS'] = '0'
+    from db.models import SQLiteRuleStore, set_rule_store
+    set_rule_store(SQLiteRuleStore(':memory:'))
+    import app as app_module
+    client = app_module.app.test_client()
+    # Rules and records use the generated fields, not just the default schema's
+    app_module.schemas.add('bench', spec.schema())
+
+    bodies = [{'rule_name': f'bench_{i}', 'rule': rule_string, 'schema': 'bench'}
+              for i, rule_string in enumerate(rule_strings)]
+
+    def create():
+        for body in bodies:
+            response = client.post('/create_rule', json=body)
+            if response.status_code != 201:
+                raise RuntimeError(f"/create_rule failed: {response.get_json()}")
+
+    evaluations = [
+        {'rule_id': bodies[i % len(bodies)]['rule_name'], 'data': records[i % len(records)], 'schema': 'bench'}
+        for i in range(requests_count)
+    ]
+
+    def evaluate_rule():
+        for body in evaluations:
+            response = client.post('/evaluate_rule', json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"/evaluate_rule failed: {response.get_json()}")
+
+    create_time = time_best(create, len(bodies), repeat)
+    # Rules now exist; the first run also warms the rule cache
+    return {
+        'http_create_rule': (create_time, len(bodies)),
+        'http_evaluate_rule': (time_best(evaluate_rule, len(evaluations), repeat), len(evaluations)),
+    }
+
+
+def run_suite(spec, rules, records_count, http_requests, repeat, seed=0):
+    rule_strings = make_rule_strings(spec, rules, seed=seed)
+    records = make_records(spec, records_count, seed=seed + 1)
+
+    timings = bench_engine(rule_strings, records, repeat)
+    if http_requests:
+        timings.update(bench_http(spec, rule_strings, records, http_requests, repeat))
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'spec': spec.to_dict(),
+            'rules': rules,
+            'records': records_count,
+            'http_requests': http_requests,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': {
+            name: {'seconds_per_op': seconds, 'ops_per_second': 1 / seconds if seconds else None, 'ops': ops}
+            for name, (seconds, ops) in timings.items()
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    # (name, baseline seconds, current seconds, ratio, regressed) for every
+    # benchmark present in both runs
+    rows = []
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = current['seconds_per_op'] / previous['seconds_per_op']
+        rows.append((name, previous['seconds_per_op'], current['seconds_per_op'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_results(results):
+    for name, result in results['results'].items():
+        print(f"{name:20} {result['seconds_per_op'] * 1e6:12.2f} us/op {result['ops_per_second']:14,.0f} ops/s")
+
+
+def print_comparison(rows, threshold):
+    for name, previous, current, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:20} {previous * 1e6:12.2f} -> {current * 1e6:12.2f} us/op  {ratio:5.2f}x{flag}")
+    print(f"threshold: {threshold:.0%} slower than baseline")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=100, help='number of synthetic rules')
+    parser.add_argument('--records', type=int, default=100, help='number of synthetic records')
+    parser.add_argument('--depth', type=int, default=2, help='AND/OR nesting depth of each rule')
+    parser.add_argument('--width', type=int, default=3, help='clauses per AND/OR')
+    parser.add_argument('--and-ratio', type=float, default=0.5, help='share of AND among boolean operators')
+    parser.add_argument('--literals', choices=['int', 'str', 'mixed'], default='mixed')
+    parser.add_argument('--http-requests', type=int, default=500,
+                        help='/evaluate_rule requests per run (0 skips the HTTP benchmarks)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='PATH', help='write the results to PATH as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare the results with the baseline at PATH')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline, as a fraction (default 0.2)')
+    args = parser.parse_args(argv)
+
+    spec = RuleSpec(depth=args.depth, width=args.width, and_ratio=args.and_ratio, literals=args.literals)
+    results = run_suite(spec, args.rules, args.records, args.http_requests, args.repeat, seed=args.seed)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('spec') != results['meta']['spec']:
+            print("warning: baseline was recorded with different rule parameters")
+        rows = compare(results, baseline, args.threshold)
+        print()
+        print_comparison(rows, args.threshold)
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Seeded generators of synthetic rules and records for the benchmarks.
+
+Rules are rule strings in the syntax create_rule accepts; records are
+dicts holding every field the rules reference (including the keys the
+API requires), so evaluation never fails on a missing field.
+"""
+import random
+
+DEPARTMENTS = ['Sales', 'HR', 'Marketing', 'Engineering', 'Finance', 'Legal']
+COMPARISONS = ['>', '<', '>=', '<=', '==', '!=']
+
+
+class RuleSpec:
+    """Shape of a generated rule set.
+
+    depth:       levels of AND/OR nesting (0 gives single comparisons)
+    width:       clauses joined by each AND/OR
+    and_ratio:   probability that a boolean node is AND rather than OR
+    literals:    'int', 'str' or 'mixed' comparison literals
+    int_fields / str_fields: extra numeric and categorical fields to use
+                 besides age, income and department
+    """
+
+    def __init__(self, depth=2, width=3, and_ratio=0.5, literals='mixed', int_fields=2, str_fields=2):
+        if literals not in ('int', 'str', 'mixed'):
+            raise ValueError(f"literals must be 'int', 'str' or 'mixed', not {literals!r}")
+        self.depth = depth
+        self.width = width
+        self.and_ratio = and_ratio
+        self.literals = literals
+        self.int_fields = ['age', 'income'] + [f'num_{i}' for i in range(int_fields)]
+        self.str_fields = ['department'] + [f'cat_{i}' for i in range(str_fields)]
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'width': self.width,
+            'and_ratio': self.and_ratio,
+            'literals': self.literals,
+            'int_fields': len(self.int_fields) - 2,
+            'str_fields': len(self.str_fields) - 1,
+        }
+
+    def schema(self):
+        # Field schema (see engine.schema) covering every generated field
+        fields = {field: {'type': 'int'} for field in self.int_fields}
+        fields.update((field, {'type': 'str'}) for field in self.str_fields)
+        return {'fields': fields}
+
+
+def make_rule_string(spec, rng):
+    return _expression(spec, rng, spec.depth)
+
+
+def make_rule_strings(spec, count, seed=0):
+    rng = random.Random(seed)
+    return [make_rule_string(spec, rng) for _ in range(count)]
+
+
+def make_records(spec, count, seed=1):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        record = {field: _int_value(field, rng) for field in spec.int_fields}
+        for field in spec.str_fields:
+            record[field] = rng.choice(DEPARTMENTS)
+        records.append(record)
+    return records
+
+
+def _expression(spec, rng, depth):
+    if depth == 0:
+        return _comparison(spec, rng)
+    op = ' and ' if rng.random() < spec.and_ratio else ' or '
+    clauses = [_expression(spec, rng, depth - 1) for _ in range(spec.width)]
+    return '(' + op.join(clauses) + ')'
+
+
+def _comparison(spec, rng):
+    literal_type = spec.literals
+    if literal_type == 'mixed':
+        literal_type = rng.choice(['int', 'str'])
+    if literal_type == 'int':
+        field = rng.choice(spec.int_fields)
+        return f'{field} {rng.choice(COMPARISONS)} {_int_value(field, rng)}'
+    # Strings are only compared for (in)equality, as rules normally do
+    field = rng.choice(spec.str_fields)
+    return f"{field} {rng.choice(['==', '!='])} '{rng.choice(DEPARTMENTS)}'"
+
+
+def _int_value(field, rng):
+    if field == 'age':
+        return rng.randint(18, 65)
+    if field == 'income':
+        return rng.randint(10000, 100000)
+    return rng.randint(0, 1000)
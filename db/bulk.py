@@ -0,0 +1,141 @@
+"""Bulk import and export of rules.
+
+Rules are exchanged as NDJSON, one ``{"rule_name": ..., "rule": ...}``
+object per line; export lines also carry the stored AST and version, and
+can be imported again as they are (the rule is then built from the AST).
+
+    python -m db.bulk import rules.ndjson [--skip-invalid] [--workers N]
+    python -m db.bulk export [rules.ndjson]
+"""
+import argparse
+import json
+import sys
+from engine.parallel import parse_rules, parse_rule_dict
+from engine.schema import SchemaError
+from db.models import store_rules, iter_rules
+
+
+def read_entries(lines):
+    # Rule entries from NDJSON lines; a line that is not a JSON object
+    # becomes an entry that fails validation
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'Invalid JSON: {str(e)}')
+
+
+def import_rules(entries, skip_invalid=False, workers=None, schema=None):
+    """Validate rule entries and store them in one transaction.
+
+    Entries with an ``ast`` (as exported) are built from it; the others
+    have their rule strings parsed in parallel (in ``workers`` processes;
+    pass 1 from a multithreaded server, which should not fork). Given a
+    ``Schema``, every rule is checked against it. Returns ``(report,
+    stored)`` where the report lists per-entry errors; unless
+    ``skip_invalid`` is set, nothing is stored when any entry is invalid.
+    ``stored`` is False if the database write failed.
+    """
+    entries = list(entries)
+    errors = []
+    names = []
+    rule_strings = []
+    for index, entry in enumerate(entries):
+        error = _entry_error(entry)
+        if error is not None:
+            errors.append({'index': index, 'rule_name': _entry_name(entry), 'error': error})
+            continue
+        names.append((index, entry['rule_name'], entry.get('ast')))
+        rule_strings.append(entry.get('rule', entry.get('rule_string')))
+
+    # Only rules without a stored AST need their strings parsed
+    parsed_strings = iter(parse_rules(
+        [rule_string for (_, _, ast_data), rule_string in zip(names, rule_strings) if ast_data is None],
+        workers=workers
+    ))
+    rules = []
+    for (index, rule_name, ast_data), rule_string in zip(names, rule_strings):
+        if ast_data is None:
+            parsed = next(parsed_strings)
+        else:
+            try:
+                parsed = parse_rule_dict(ast_data)
+            except Exception as e:
+                parsed = e
+        if not isinstance(parsed, Exception) and schema is not None:
+            schema_errors = schema.rule_errors(parsed)
+            if schema_errors:
+                parsed = SchemaError(schema_errors)
+        if isinstance(parsed, Exception):
+            errors.append({'index': index, 'rule_name': rule_name, 'error': str(parsed)})
+        else:
+            rules.append((rule_name, rule_string, parsed))
+    errors.sort(key=lambda error: error['index'])
+
+    report = {'imported': 0, 'errors': errors}
+    if (errors and not skip_invalid) or not rules:
+        return report, True
+    if not store_rules(rules):
+        return report, False
+    report['imported'] = len(rules)
+    return report, True
+
+
+def export_lines(batch_size=500):
+    # NDJSON lines for every stored rule, read from the store in batches
+    for rule_name, rule_string, ast_dict, version in iter_rules(batch_size):
+        yield json.dumps({'rule_name': rule_name, 'rule': rule_string, 'ast': ast_dict, 'version': version}) + '\n'
+
+
+def _entry_error(entry):
+    if isinstance(entry, Exception):
+        return str(entry)
+    if not isinstance(entry, dict):
+        return 'Expected a JSON object'
+    if not isinstance(entry.get('rule_name'), str) or not entry['rule_name']:
+        return 'rule_name is required'
+    if not isinstance(entry.get('rule', entry.get('rule_string')), str):
+        return 'rule is required'
+    return None
+
+
+def _entry_name(entry):
+    return entry.get('rule_name') if isinstance(entry, dict) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='import rules from an NDJSON file ("-" for stdin)')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--skip-invalid', action='store_true', help='store the valid rules even if some are invalid')
+    import_parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count)')
+    export_parser = commands.add_parser('export', help='export all rules as NDJSON (default: stdout)')
+    export_parser.add_argument('path', nargs='?', default='-')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        source = sys.stdin if args.path == '-' else open(args.path)
+        with source:
+            report, stored = import_rules(read_entries(source), args.skip_invalid, args.workers)
+        for error in report['errors']:
+            print(f"entry {error['index']} ({error['rule_name']}): {error['error']}", file=sys.stderr)
+        if not stored:
+            print("error: the rules could not be written to the database", file=sys.stderr)
+            return 1
+        print(f"imported {report['imported']} rules")
+        return 1 if report['errors'] and not args.skip_invalid else 0
+
+    target = sys.stdout if args.path == '-' else open(args.path, 'w')
+    try:
+        target.writelines(export_lines())
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
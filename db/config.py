@@ -0,0 +1,65 @@
+import os
+
+# Database settings are read from the environment so credentials are not
+# kept in the source. RULE_STORE_BACKEND selects "postgres" or "sqlite".
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, '') else default
+
+
+def _env_list(name):
+    # Comma-separated names, without surrounding spaces or empty entries
+    return [item.strip() for item in os.environ.get(name, '').split(',') if item.strip()]
+
+
+def _job_store_path(sqlite_path):
+    # Jobs have to survive a restart, so they are kept in a file by default:
+    # next to the SQLite rule store, or in the working directory
+    path = os.environ.get('JOB_STORE_PATH')
+    if path:
+        return path
+    directory = os.path.dirname(os.path.abspath(sqlite_path)) if sqlite_path != ':memory:' else ''
+    return os.path.join(directory, 'jobs.db')
+
+
+def load_config():
+    sqlite_path = os.environ.get('RULE_STORE_SQLITE_PATH', ':memory:')
+    return {
+        'backend': os.environ.get('RULE_STORE_BACKEND', 'postgres').lower(),
+        'postgres': {
+            'dbname': os.environ.get('DB_NAME', 'rule_engine_db'),
+            'user': os.environ.get('DB_USER', 'postgres'),
+            'password': os.environ.get('DB_PASSWORD', ''),
+            'host': os.environ.get('DB_HOST', 'localhost'),
+            'port': os.environ.get('DB_PORT', '5432'),
+            'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 5),
+        },
+        'pool_min': _env_int('DB_POOL_MIN', 1),
+        'pool_max': _env_int('DB_POOL_MAX', 10),
+        'pool_timeout': _env_float('DB_POOL_TIMEOUT', 10.0),
+        'health_check_interval': _env_float('DB_HEALTH_CHECK_INTERVAL', 30.0),
+        'statement_timeout_ms': _env_int('DB_STATEMENT_TIMEOUT_MS', 5000),
+        'sqlite_path': sqlite_path,
+        'rule_cache_size': _env_int('RULE_CACHE_SIZE', 1024),
+        'rule_cache_revalidate_seconds': _env_float('RULE_CACHE_REVALIDATE_SECONDS', 5.0),
+        'trace_sample_rate': _env_float('TRACE_SAMPLE_RATE', 0.0),
+        'schema_path': os.environ.get('RULE_SCHEMA_PATH') or None,
+        'snapshot_path': os.environ.get('RULE_SNAPSHOT_PATH') or None,
+        'match_tables': _env_list('MATCH_TABLES'),
+        'job_store_path': _job_store_path(sqlite_path),
+        'job_workers': _env_int('JOB_WORKERS', 2),
+        'job_queue_max': _env_int('JOB_QUEUE_MAX', 100),
+        'job_chunk_size': _env_int('JOB_CHUNK_SIZE', 1000),
+        'job_lease_seconds': _env_float('JOB_LEASE_SECONDS', 60.0),
+        'job_input_dir': os.environ.get('JOB_INPUT_DIR') or None,
+        'result_cache_size': _env_int('RESULT_CACHE_SIZE', 0),
+        'result_cache_ttl_seconds': _env_float('RESULT_CACHE_TTL_SECONDS', 0.0),
+        'result_cache_rules': _env_list('RESULT_CACHE_RULES'),
+    }
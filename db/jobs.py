@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Job states; queued jobs, and running jobs whose owner stopped sending
+# heartbeats, are picked up by any process sharing the store
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+
+
+class JobStore:
+    """Evaluation jobs and their results, kept in a local SQLite file so
+    they survive a restart (":memory:" keeps them for the process only).
+
+    Inline input records are kept apart from the job's spec, one JSON row
+    each, so status polls do not read them. Results are stored in order,
+    one JSON row per input record, together
+    with the job's progress, so an interrupted job resumes after the last
+    stored record. A running job belongs to the process that claimed it
+    (its ``owner``), which refreshes the job's heartbeat while it runs; only
+    jobs whose heartbeat is older than the lease are taken over. Writes are
+    conditional on the job's state and owner, so a job cancelled or taken
+    over while it runs stops at its next write.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        # One shared connection (required for ":memory:"), serialized by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    spec TEXT NOT NULL,
+                    total INTEGER,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    owner TEXT,
+                    heartbeat REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                '''
+            )
+            self._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS job_records (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                )
+                '''
+            )
+            self._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                )
+                '''
+            )
+
+    def create_job(self, job_id, spec, total, max_queued, records=None):
+        # False, and nothing stored, when max_queued jobs are already waiting
+        with self._lock, self._conn:
+            (queued,) = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+            if queued >= max_queued:
+                return False
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, spec, total, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(spec), total, time.time())
+            )
+            if records:
+                self._conn.executemany(
+                    "INSERT INTO job_records (job_id, position, record) VALUES (?, ?, ?)",
+                    [(job_id, position, json.dumps(record)) for position, record in enumerate(records)]
+                )
+        return True
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, spec, total, processed, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('id', 'status', 'spec', 'total', 'processed', 'error', 'created_at', 'started_at', 'finished_at')
+        job = dict(zip(keys, row))
+        job['spec'] = json.loads(job['spec'])
+        return job
+
+    def records(self, job_id, offset, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM job_records WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def results(self, job_id, offset, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM job_results WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (job_id, offset, limit)
+            ).fetchall()
+        return [json.loads(result) for (result,) in rows]
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def claimable(self, lease):
+        # Running jobs whose owner has not sent a heartbeat for `lease`
+        # seconds go back to the queue; returns the ids of all queued jobs
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL WHERE status = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, time.time() - lease)
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+        return [job_id for (job_id,) in rows]
+
+    def heartbeat(self, owner):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?", (time.time(), owner, RUNNING)
+            )
+
+    def start_job(self, job_id, owner):
+        # Claim a queued job for `owner`; False if it was cancelled or
+        # claimed by another worker meanwhile
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat = ?, started_at = COALESCE(started_at, ?) "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, owner, now, now, job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def set_total(self, job_id, total):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def add_results(self, job_id, owner, position, results):
+        # Store results for records position.. onwards and move the progress
+        # past them; False, and nothing stored, if the job is no longer
+        # running for `owner`
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET processed = ?, heartbeat = ? "
+                "WHERE id = ? AND status = ? AND owner = ? AND processed = ?",
+                (position + len(results), time.time(), job_id, RUNNING, owner, position)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, position, result) VALUES (?, ?, ?)",
+                [(job_id, position + offset, json.dumps(result)) for offset, result in enumerate(results)]
+            )
+        return True
+
+    def finish_job(self, job_id, owner, status, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ? AND owner = ?",
+                (status, error, time.time(), job_id, RUNNING, owner)
+            )
+
+    def cancel_job(self, job_id):
+        # Returns the job's status afterwards, or None if there is no such job
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,104 +1,856 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+import sqlite3
 import json
 import logging
-from engine.ast_builder import Node
+import threading
+import time
+from contextlib import contextmanager
+from engine.ast_builder import Node, serialize_ast
+from engine.binary import encode_ast, decode_ast
+from engine.sql import compile_where, compile_errors, quote_identifier
+from engine.metrics import metrics
+from db.config import load_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    try:
-        return psycopg2.connect(
-            dbname="rule_engine_db",
-            user="postgres",
-            password="prasanth",
-            host='localhost',
-            port='5432'
-        )
-    except psycopg2.DatabaseError as e:
-        logger.error(f"Database connection error: {e}")
-        return None
 
-def store_rule(rule_name: str, rule_string: str, rule_ast: Node) -> bool:
-    conn = get_db_connection()
-    if conn is None:
-        return False
-    try:
-        with conn:
+def load_ast(ast_bin, ast_dict) -> Node:
+    # Prefer the binary AST; rows written before it existed only have JSON
+    if ast_bin is not None:
+        return decode_ast(bytes(ast_bin))
+    return Node.from_dict(ast_dict)
+
+
+class RuleStore:
+    """Interface shared by the rule storage backends."""
+
+    def store_rule(self, rule_name: str, rule_string: str, rule_ast: Node) -> bool:
+        raise NotImplementedError
+
+    def retrieve_rule(self, rule_name: str) -> Node:
+        loaded = self.retrieve_rule_version(rule_name)
+        return loaded[0] if loaded is not None else None
+
+    def retrieve_rule_version(self, rule_name: str):
+        # Return (ast, version) for a rule, or None if it does not exist
+        raise NotImplementedError
+
+    def get_rule_version(self, rule_name: str):
+        # Cheap staleness check: the rule's current version, or None
+        raise NotImplementedError
+
+    def get_all_rules(self) -> list:
+        raise NotImplementedError
+
+    def get_rule_versions(self):
+        # {rule_name: version} for every rule, or None if it cannot be read
+        raise NotImplementedError
+
+    def delete_rule(self, rule_name: str) -> bool:
+        raise NotImplementedError
+
+    def store_rules(self, rules) -> bool:
+        # Upsert [(rule_name, rule_string, ast), ...] in one transaction;
+        # names must be distinct
+        raise NotImplementedError
+
+    def iter_rules(self, batch_size=500):
+        # Yield (rule_name, rule_string, ast_dict, version) for every rule in
+        # name order, without loading the whole table at once
+        raise NotImplementedError
+
+    def list_rules(self, limit, after=None, prefix=None):
+        # Up to `limit` rule names in name order, after the name `after` and
+        # starting with `prefix`; None on a database error
+        raise NotImplementedError
+
+    def iter_rule_names(self, prefix=None, after=None, batch_size=1000):
+        # Like list_rules without a limit, streamed
+        raise NotImplementedError
+
+    def rules_version(self):
+        # Counter that changes on every committed write to the rules table, or None
+        raise NotImplementedError
+
+    # SQL dialect of the backend, for engine.sql
+    dialect = None
+
+    def table_columns(self, table_name: str):
+        # {column: kind} (see engine.sql.COLUMN_KINDS) for a data table, or
+        # None if there is no such table
+        raise NotImplementedError
+
+    def _query(self, sql: str, params):
+        # (column names, rows) of a read-only query, or None on a database error
+        raise NotImplementedError
+
+    def match_rows(self, table_name: str, rule_ast: Node, limit=None):
+        """Rows of ``table_name`` the rule is true for, as dicts.
+
+        The rule runs inside the database as a WHERE clause. Returns None
+        on a database error; raises LookupError if the table does not exist.
+        """
+        columns = self._columns_or_raise(table_name)
+        where, params = compile_where(rule_ast, columns, self.dialect)
+        sql = f"SELECT * FROM {quote_identifier(table_name)} WHERE {where}"
+        if limit is not None:
+            sql += " LIMIT " + self._placeholder
+            params = params + (limit,)
+        result = self._query(sql, params)
+        if result is None:
+            return None
+        names, rows = result
+        return [dict(zip(names, row)) for row in rows]
+
+    def count_matches(self, table_name: str, rule_ast: Node, count_errors=False):
+        # {'matches': n} and, if asked, {'errors': n} for the rows the rule
+        # would raise on; None on a database error
+        columns = self._columns_or_raise(table_name)
+        counts = {}
+        compiled = [('matches', compile_where(rule_ast, columns, self.dialect))]
+        if count_errors:
+            compiled.append(('errors', compile_errors(rule_ast, columns, self.dialect)))
+        for key, (where, params) in compiled:
+            result = self._query(f"SELECT COUNT(*) FROM {quote_identifier(table_name)} WHERE {where}", params)
+            if result is None:
+                return None
+            counts[key] = result[1][0][0]
+        return counts
+
+    def _columns_or_raise(self, table_name):
+        columns = self.table_columns(table_name) if table_name not in _INTERNAL_TABLES else None
+        if not columns:
+            raise LookupError(f"Table '{table_name}' does not exist")
+        return columns
+
+    def close(self):
+        pass
+
+
+# Tables of the rule store itself, never queried as data tables
+_INTERNAL_TABLES = ('rules', 'rules_version')
+
+# information_schema.columns data types by column kind
+_POSTGRES_KINDS = {
+    'smallint': 'number', 'integer': 'number', 'bigint': 'number', 'numeric': 'number',
+    'real': 'number', 'double precision': 'number',
+    'boolean': 'bool',
+    'text': 'text', 'character varying': 'text', 'character': 'text',
+}
+
+
+def _sqlite_kind(declared_type):
+    # Column kind from SQLite's type affinity rules
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'number'
+    if 'CHAR' in declared_type or 'CLOB' in declared_type or 'TEXT' in declared_type:
+        return 'text'
+    if 'BLOB' in declared_type or not declared_type:
+        return 'other'
+    return 'number'
+
+
+# Run in the transaction of every write to the rules table
+_BUMP_RULES_VERSION = "UPDATE rules_version SET value = value + 1 WHERE id = 1"
+
+
+class PostgresRuleStore(RuleStore):
+    """Rule store backed by a bounded pool of PostgreSQL connections."""
+
+    dialect = 'postgres'
+    _placeholder = '%s'
+
+    def __init__(self, pool_min=1, pool_max=10, pool_timeout=10.0,
+                 health_check_interval=30.0, statement_timeout_ms=5000, **connect_kwargs):
+        if statement_timeout_ms:
+            connect_kwargs.setdefault('options', f'-c statement_timeout={statement_timeout_ms}')
+        self.connect_kwargs = connect_kwargs
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool fails immediately when exhausted, so callers
+        # wait on this semaphore (up to pool_timeout) for a free slot instead
+        self._slots = threading.BoundedSemaphore(pool_max)
+        self._last_used = {}
+        self._schema_ready = False
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.pool_min, self.pool_max, **self.connect_kwargs
+                    )
+        return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        # Only ping connections that have been idle for a while
+        last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
             with conn.cursor() as cur:
-                cur.execute(
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, pool, conn):
+        self._last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise psycopg2.pool.PoolError("Timed out waiting for a database connection")
+        pool = None
+        conn = None
+        broken = False
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            if not self._is_healthy(conn):
+                logger.warning("Discarding unhealthy database connection")
+                self._discard(pool, conn)
+                conn = pool.getconn()
+            if not self._schema_ready:
+                self._ensure_schema(conn)
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                if broken or conn.closed:
+                    self._discard(pool, conn)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                    pool.putconn(conn)
+            self._slots.release()
+
+    def _ensure_schema(self, conn):
+        # Every write takes a new value from rules_version_seq, so a rule's
+        # version changes whenever it is stored, even after delete + create
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("CREATE SEQUENCE IF NOT EXISTS rules_version_seq")
+                    cur.execute(
+                        "ALTER TABLE rules ADD COLUMN IF NOT EXISTS version BIGINT "
+                        "NOT NULL DEFAULT nextval('rules_version_seq')"
+                    )
+                    # Version of the whole table, bumped in the transaction of
+                    # each write so readers only see committed writes (the
+                    # sequence advances before the write commits). It starts
+                    # from the sequence, past every version handed out so far
+                    cur.execute(
+                        "CREATE TABLE IF NOT EXISTS rules_version "
+                        "(id INTEGER PRIMARY KEY CHECK (id = 1), value BIGINT NOT NULL)"
+                    )
+                    cur.execute(
+                        "INSERT INTO rules_version (id, value) "
+                        "SELECT 1, CASE WHEN is_called THEN last_value ELSE 0 END FROM rules_version_seq "
+                        "ON CONFLICT (id) DO NOTHING"
+                    )
+                    # Binary AST (engine/binary.py), decoded instead of the JSONB when present
+                    cur.execute("ALTER TABLE rules ADD COLUMN IF NOT EXISTS ast_bin BYTEA")
+            self._schema_ready = True
+        except psycopg2.Error as e:
+            logger.error(f"Error preparing rules table: {e}")
+
+    def store_rule(self, rule_name: str, rule_string: str, rule_ast: Node) -> bool:
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            '''
+                            INSERT INTO rules (rule_name, rule_string, ast, ast_bin, version)
+                            VALUES (%s, %s, %s, %s, nextval('rules_version_seq'))
+                            ON CONFLICT (rule_name) DO UPDATE
+                            SET rule_string = EXCLUDED.rule_string, ast = EXCLUDED.ast,
+                                ast_bin = EXCLUDED.ast_bin, version = EXCLUDED.version
+                            ''',
+                            (rule_name, rule_string,
+                             json.dumps(serialize_ast(rule_ast)),  # Store AST as JSON
+                             psycopg2.Binary(encode_ast(rule_ast)))
+                        )
+                        cur.execute(_BUMP_RULES_VERSION)
+            logger.debug("Rule '%s' stored/updated successfully.", rule_name)
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Error storing rule: {e}")
+            return False
+
+    def store_rules(self, rules) -> bool:
+        rows = [(rule_name, rule_string, json.dumps(serialize_ast(rule_ast)),
+                 psycopg2.Binary(encode_ast(rule_ast)))
+                for rule_name, rule_string, rule_ast in rules]
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        # One multi-row upsert, sent in a single round trip
+                        psycopg2.extras.execute_values(
+                            cur,
+                            '''
+                            INSERT INTO rules (rule_name, rule_string, ast, ast_bin, version)
+                            VALUES %s
+                            ON CONFLICT (rule_name) DO UPDATE
+                            SET rule_string = EXCLUDED.rule_string, ast = EXCLUDED.ast,
+                                ast_bin = EXCLUDED.ast_bin, version = EXCLUDED.version
+                            ''',
+                            rows,
+                            template="(%s, %s, %s, %s, nextval('rules_version_seq'))",
+                            page_size=max(len(rows), 1)
+                        )
+                        cur.execute(_BUMP_RULES_VERSION)
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Error storing rules: {e}")
+            return False
+
+    def iter_rules(self, batch_size=500):
+        # A named (server-side) cursor sends batch_size rows per round trip
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor(name='export_rules') as cur:
+                        cur.itersize = batch_size
+                        cur.execute("SELECT rule_name, rule_string, ast, ast_bin, version FROM rules ORDER BY rule_name")
+                        for rule_name, rule_string, ast_dict, ast_bin, version in cur:
+                            if ast_dict is None:
+                                ast_dict = serialize_ast(load_ast(bytes(ast_bin), None))
+                            yield rule_name, rule_string, ast_dict, version
+        except psycopg2.Error as e:
+            logger.error(f"Error reading rules: {e}")
+            raise
+
+    def list_rules(self, limit, after=None, prefix=None):
+        where, params = self._name_filter(after, prefix)
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(f"SELECT rule_name FROM rules{where} ORDER BY rule_name LIMIT %s",
+                                    params + (limit,))
+                        return [row[0] for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            logger.error(f"Error listing rules: {e}")
+            return None
+
+    def iter_rule_names(self, prefix=None, after=None, batch_size=1000):
+        where, params = self._name_filter(after, prefix)
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor(name='list_rules') as cur:
+                        cur.itersize = batch_size
+                        cur.execute(f"SELECT rule_name FROM rules{where} ORDER BY rule_name", params)
+                        for row in cur:
+                            yield row[0]
+        except psycopg2.Error as e:
+            logger.error(f"Error listing rules: {e}")
+            raise
+
+    @staticmethod
+    def _name_filter(after, prefix):
+        conditions = []
+        params = ()
+        if after is not None:
+            conditions.append("rule_name > %s")
+            params += (after,)
+        if prefix:
+            escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("rule_name LIKE %s ESCAPE '\\'")
+            params += (escaped + '%',)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def rules_version(self):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT value FROM rules_version WHERE id = 1")
+                        return cur.fetchone()[0]
+        except psycopg2.Error as e:
+            logger.error(f"Error fetching rules version: {e}")
+            return None
+
+    def retrieve_rule_version(self, rule_name: str):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        # The JSONB is only sent for rows without a binary AST
+                        cur.execute(
+                            "SELECT ast_bin, CASE WHEN ast_bin IS NULL THEN ast END, version "
+                            "FROM rules WHERE rule_name = %s",
+                            (rule_name,)
+                        )
+                        result = cur.fetchone()
+            if result is None:
+                logger.debug("Rule '%s' not found in the database.", rule_name)
+                return None
+
+            ast_bin, ast_dict, version = result
+            return load_ast(ast_bin, ast_dict), version
+        except psycopg2.Error as e:
+            logger.error(f"Error retrieving rule: {e}")
+            return None
+
+    def get_rule_version(self, rule_name: str):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT version FROM rules WHERE rule_name = %s", (rule_name,))
+                        result = cur.fetchone()
+            return result[0] if result is not None else None
+        except psycopg2.Error as e:
+            logger.error(f"Error fetching rule version: {e}")
+            return None
+
+    def get_all_rules(self) -> list:
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT rule_name FROM rules")
+                        return [row[0] for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            logger.error(f"Error fetching all rules: {e}")
+            return []
+
+    def get_rule_versions(self):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT rule_name, version FROM rules")
+                        return dict(cur.fetchall())
+        except psycopg2.Error as e:
+            logger.error(f"Error fetching rule versions: {e}")
+            return None
+
+    def delete_rule(self, rule_name: str) -> bool:
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute("DELETE FROM rules WHERE rule_name = %s", (rule_name,))
+                        # Advance the version so deletions are visible too
+                        cur.execute(_BUMP_RULES_VERSION)
+            logger.debug("Rule '%s' deleted successfully.", rule_name)
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Error deleting rule: {e}")
+            return False
+
+    def table_columns(self, table_name: str):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "SELECT column_name, data_type FROM information_schema.columns "
+                            "WHERE table_schema = current_schema() AND table_name = %s "
+                            "ORDER BY ordinal_position",
+                            (table_name,)
+                        )
+                        rows = cur.fetchall()
+            return {name: _POSTGRES_KINDS.get(data_type, 'other') for name, data_type in rows} or None
+        except psycopg2.Error as e:
+            logger.error(f"Error reading table columns: {e}")
+            return None
+
+    def _query(self, sql: str, params):
+        try:
+            with self.connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        return [column[0] for column in cur.description], cur.fetchall()
+        except psycopg2.Error as e:
+            logger.error(f"Error querying table: {e}")
+            return None
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+        self._last_used.clear()
+
+
+class SQLiteRuleStore(RuleStore):
+    """Rule store backed by SQLite; ":memory:" needs no database server."""
+
+    dialect = 'sqlite'
+    _placeholder = '?'
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        # One shared connection (required for ":memory:"), serialized by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rule_name TEXT UNIQUE,
+                    rule_string TEXT NOT NULL,
+                    ast TEXT,
+                    ast_bin BLOB,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+                '''
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(rules)")]
+            if 'version' not in columns:
+                self._conn.execute("ALTER TABLE rules ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            if 'ast_bin' not in columns:
+                self._conn.execute("ALTER TABLE rules ADD COLUMN ast_bin BLOB")
+            # Single-row counter standing in for a Postgres sequence
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rules_version (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)"
+            )
+            self._conn.execute("INSERT OR IGNORE INTO rules_version (id, value) VALUES (1, 0)")
+
+    def _next_version(self):
+        self._conn.execute("UPDATE rules_version SET value = value + 1 WHERE id = 1")
+        return self._conn.execute("SELECT value FROM rules_version WHERE id = 1").fetchone()[0]
+
+    def store_rule(self, rule_name: str, rule_string: str, rule_ast: Node) -> bool:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
                     '''
-                    INSERT INTO rules (rule_name, rule_string, ast)
-                    VALUES (%s, %s, %s)
+                    INSERT INTO rules (rule_name, rule_string, ast, ast_bin, version)
+                    VALUES (?, ?, ?, ?, ?)
                     ON CONFLICT (rule_name) DO UPDATE
-                    SET rule_string = EXCLUDED.rule_string, ast = EXCLUDED.ast
+                    SET rule_string = excluded.rule_string, ast = excluded.ast,
+                        ast_bin = excluded.ast_bin, version = excluded.version
                     ''',
-                    (rule_name, rule_string, json.dumps(rule_ast.to_dict()))  # Store AST as JSON
+                    (rule_name, rule_string, json.dumps(serialize_ast(rule_ast)),
+                     encode_ast(rule_ast), self._next_version())
                 )
-        logger.info(f"Rule '{rule_name}' stored/updated successfully.")
-        return True
-    except psycopg2.Error as e:
-        logger.error(f"Error storing rule: {e}")
-        return False
-    finally:
-        conn.close()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error storing rule: {e}")
+            return False
 
-def retrieve_rule(rule_name: str) -> Node:
-    logger.info(f"Retrieving rule with name: {rule_name}")
-    conn = get_db_connection()
-    if conn is None:
-        logger.error("Database connection failed.")
-        return None
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT ast FROM rules WHERE rule_name = %s", (rule_name,))
-                result = cur.fetchone()
-                logger.info(f"Query result: {result}")
-                if result is None:
-                    logger.warning(f"Rule '{rule_name}' not found in the database.")
+    def store_rules(self, rules) -> bool:
+        rows = [(rule_name, rule_string, json.dumps(serialize_ast(rule_ast)), encode_ast(rule_ast))
+                for rule_name, rule_string, rule_ast in rules]
+        try:
+            with self._lock, self._conn:
+                version = self._next_version()
+                self._conn.executemany(
+                    '''
+                    INSERT INTO rules (rule_name, rule_string, ast, ast_bin, version)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (rule_name) DO UPDATE
+                    SET rule_string = excluded.rule_string, ast = excluded.ast,
+                        ast_bin = excluded.ast_bin, version = excluded.version
+                    ''',
+                    [row + (version,) for row in rows]
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error storing rules: {e}")
+            return False
+
+    def iter_rules(self, batch_size=500):
+        after = None
+        while True:
+            try:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT rule_name, rule_string, ast, ast_bin, version FROM rules "
+                        "WHERE ? IS NULL OR rule_name > ? ORDER BY rule_name LIMIT ?",
+                        (after, after, batch_size)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading rules: {e}")
+                raise
+            for rule_name, rule_string, ast_json, ast_bin, version in rows:
+                if ast_json is not None:
+                    ast_dict = json.loads(ast_json)
+                else:
+                    ast_dict = serialize_ast(load_ast(ast_bin, None))
+                yield rule_name, rule_string, ast_dict, version
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def list_rules(self, limit, after=None, prefix=None):
+        where, params = self._name_filter(after, prefix)
+        try:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT rule_name FROM rules{where} ORDER BY rule_name LIMIT ?",
+                                          params + (limit,)).fetchall()
+            return [row[0] for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Error listing rules: {e}")
+            return None
+
+    def iter_rule_names(self, prefix=None, after=None, batch_size=1000):
+        # Keyset batches, so the shared connection is not held while streaming
+        while True:
+            names = self.list_rules(batch_size, after, prefix)
+            if names is None:
+                raise sqlite3.DatabaseError("Error listing rules")
+            yield from names
+            if len(names) < batch_size:
+                return
+            after = names[-1]
+
+    @staticmethod
+    def _name_filter(after, prefix):
+        conditions = []
+        params = ()
+        if after is not None:
+            conditions.append("rule_name > ?")
+            params += (after,)
+        if prefix:
+            # LIKE is case-insensitive in SQLite
+            conditions.append("substr(rule_name, 1, ?) = ?")
+            params += (len(prefix), prefix)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def rules_version(self):
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT value FROM rules_version WHERE id = 1").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error fetching rules version: {e}")
+            return None
+
+    def retrieve_rule_version(self, rule_name: str):
+        try:
+            with self._lock:
+                result = self._conn.execute(
+                    "SELECT ast_bin, CASE WHEN ast_bin IS NULL THEN ast END, version "
+                    "FROM rules WHERE rule_name = ?",
+                    (rule_name,)
+                ).fetchone()
+            if result is None:
+                logger.debug("Rule '%s' not found in the database.", rule_name)
+                return None
+            ast_bin, ast_json, version = result
+            return load_ast(ast_bin, json.loads(ast_json) if ast_json is not None else None), version
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving rule: {e}")
+            return None
+
+    def get_rule_version(self, rule_name: str):
+        try:
+            with self._lock:
+                result = self._conn.execute(
+                    "SELECT version FROM rules WHERE rule_name = ?", (rule_name,)
+                ).fetchone()
+            return result[0] if result is not None else None
+        except sqlite3.Error as e:
+            logger.error(f"Error fetching rule version: {e}")
+            return None
+
+    def get_all_rules(self) -> list:
+        try:
+            with self._lock:
+                return [row[0] for row in self._conn.execute("SELECT rule_name FROM rules")]
+        except sqlite3.Error as e:
+            logger.error(f"Error fetching all rules: {e}")
+            return []
+
+    def get_rule_versions(self):
+        try:
+            with self._lock:
+                return dict(self._conn.execute("SELECT rule_name, version FROM rules").fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"Error fetching rule versions: {e}")
+            return None
+
+    def delete_rule(self, rule_name: str) -> bool:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM rules WHERE rule_name = ?", (rule_name,))
+                self._next_version()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting rule: {e}")
+            return False
+
+    def table_columns(self, table_name: str):
+        try:
+            with self._lock:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+                    (table_name,)
+                ).fetchone()
+                if exists is None:
                     return None
+                rows = self._conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})").fetchall()
+            return {row[1]: _sqlite_kind(row[2]) for row in rows} or None
+        except sqlite3.Error as e:
+            logger.error(f"Error reading table columns: {e}")
+            return None
 
-                ast_dict = result[0]
-                logger.info(f"Retrieved rule AST: {ast_dict}")
-                return Node.from_dict(ast_dict)
-    except psycopg2.Error as e:
-        logger.error(f"Error retrieving rule: {e}")
-        return None
-    finally:
-        conn.close()
+    def _query(self, sql: str, params):
+        try:
+            with self._lock:
+                cursor = self._conn.execute(sql, params)
+                return [column[0] for column in cursor.description], cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error querying table: {e}")
+            return None
 
-def get_all_rules() -> list:
-    conn = get_db_connection()
-    if conn is None:
-        return []
+    def close(self):
+        self._conn.close()
+
+
+_rule_store = None
+_rule_store_lock = threading.Lock()
+_change_listeners = []
+
+
+def create_rule_store(config=None) -> RuleStore:
+    config = config or load_config()
+    if config['backend'] == 'sqlite':
+        return SQLiteRuleStore(config['sqlite_path'])
+    elif config['backend'] == 'postgres':
+        return PostgresRuleStore(
+            pool_min=config['pool_min'],
+            pool_max=config['pool_max'],
+            pool_timeout=config['pool_timeout'],
+            health_check_interval=config['health_check_interval'],
+            statement_timeout_ms=config['statement_timeout_ms'],
+            **config['postgres']
+        )
+    raise ValueError(f"Unknown rule store backend: {config['backend']}")
+
+
+def get_rule_store() -> RuleStore:
+    global _rule_store
+    if _rule_store is None:
+        with _rule_store_lock:
+            if _rule_store is None:
+                _rule_store = create_rule_store()
+    return _rule_store
+
+
+def set_rule_store(store: RuleStore):
+    # Swap the process-wide store, e.g. for an in-memory SQLite store in tests
+    global _rule_store
+    with _rule_store_lock:
+        if _rule_store is not None and _rule_store is not store:
+            _rule_store.close()
+        _rule_store = store
+
+
+def on_rule_change(callback):
+    # Register callback(rule_name), called after a rule is stored or deleted
+    _change_listeners.append(callback)
+    return callback
+
+def _notify_rule_change(rule_name: str):
+    for callback in _change_listeners:
+        try:
+            callback(rule_name)
+        except Exception as e:
+            logger.error(f"Error in rule change listener: {e}")
+
+@contextmanager
+def _db_timer(operation):
+    # Record the time spent in a rule store call in the metrics registry
+    start = time.perf_counter()
     try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT rule_name FROM rules")
-                return [row[0] for row in cur.fetchall()]
-    except psycopg2.Error as e:
-        logger.error(f"Error fetching all rules: {e}")
-        return []
-    finally:
-        conn.close()
+        yield
+    except Exception:
+        metrics.record_db(operation, time.perf_counter() - start, error=True)
+        raise
+    metrics.record_db(operation, time.perf_counter() - start)
+
+def store_rule(rule_name: str, rule_string: str, rule_ast: Node) -> bool:
+    with _db_timer('store_rule'):
+        stored = get_rule_store().store_rule(rule_name, rule_string, rule_ast)
+    _notify_rule_change(rule_name)
+    return stored
+
+def retrieve_rule(rule_name: str) -> Node:
+    with _db_timer('retrieve_rule'):
+        return get_rule_store().retrieve_rule(rule_name)
+
+def retrieve_rule_version(rule_name: str):
+    with _db_timer('retrieve_rule_version'):
+        return get_rule_store().retrieve_rule_version(rule_name)
+
+def get_rule_version(rule_name: str):
+    with _db_timer('get_rule_version'):
+        return get_rule_store().get_rule_version(rule_name)
+
+def get_all_rules() -> list:
+    with _db_timer('get_all_rules'):
+        return get_rule_store().get_all_rules()
+
+def get_rule_versions():
+    with _db_timer('get_rule_versions'):
+        return get_rule_store().get_rule_versions()
+
+def match_rows(table_name: str, rule_ast: Node, limit=None):
+    with _db_timer('match_rows'):
+        return get_rule_store().match_rows(table_name, rule_ast, limit)
+
+def count_matches(table_name: str, rule_ast: Node, count_errors=False):
+    with _db_timer('count_matches'):
+        return get_rule_store().count_matches(table_name, rule_ast, count_errors)
+
+def store_rules(rules) -> bool:
+    # rules: [(rule_name, rule_string, ast), ...]; a later entry for the same
+    # name replaces an earlier one
+    rules = list({rule_name: (rule_name, rule_string, rule_ast)
+                  for rule_name, rule_string, rule_ast in rules}.values())
+    with _db_timer('store_rules'):
+        stored = get_rule_store().store_rules(rules)
+    if stored:
+        for rule_name, _, _ in rules:
+            _notify_rule_change(rule_name)
+    return stored
+
+def iter_rules(batch_size=500):
+    return get_rule_store().iter_rules(batch_size)
+
+def list_rules(limit, after=None, prefix=None):
+    with _db_timer('list_rules'):
+        return get_rule_store().list_rules(limit, after, prefix)
+
+def iter_rule_names(prefix=None, after=None):
+    return get_rule_store().iter_rule_names(prefix, after)
+
+def rules_version():
+    with _db_timer('rules_version'):
+        return get_rule_store().rules_version()
 
 def delete_rule(rule_name: str) -> bool:
-    conn = get_db_connection()
-    if conn is None:
-        return False
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM rules WHERE rule_name = %s", (rule_name,))
-        logger.info(f"Rule '{rule_name}' deleted successfully.")
-        return True
-    except psycopg2.Error as e:
-        logger.error(f"Error deleting rule: {e}")
-        return False
-    finally:
-        conn.close()
+    with _db_timer('delete_rule'):
+        deleted = get_rule_store().delete_rule(rule_name)
+    _notify_rule_change(rule_name)
+    return deleted
 
 def evaluate_rule(rule_name: str, input_data: dict) -> bool:
     ast = retrieve_rule(rule_name)
@@ -107,7 +859,6 @@ def evaluate_rule(rule_name: str, input_data: dict) -> bool:
         return None
 
     try:
-        logger.info(f"Evaluating AST for rule '{rule_name}' with input data: {input_data}")
         result = ast.evaluate(input_data)  # Ensure that Node has an evaluate method
         return result
     except Exception as e:
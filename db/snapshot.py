@@ -0,0 +1,139 @@
+"""Precompiled rule snapshots for fast worker startup.
+
+A snapshot holds every stored rule, parsed and optimized, in the binary AST
+format, and the rules table version it was taken at. A worker started with
+RULE_SNAPSHOT_PATH maps the file and fills its rule cache from it before
+serving, instead of loading rules one by one on first use; a snapshot whose
+version no longer matches the table is rebuilt first.
+
+    python -m db.snapshot build rules.snap
+    python -m db.snapshot info rules.snap
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from engine.ast_builder import Node
+from engine.binary import encode_ast, decode_ast
+from engine.optimizer import optimize_rule
+from db.models import iter_rules, rules_version
+
+# Snapshot file format, version 1 (little-endian):
+#
+#   b"RSNP" | version u8 | rules version i64 | rule count u32 | entries
+#
+# Each entry is a fixed header (name length u32 | rule version i64 | AST
+# length u32 | plan length u32) followed by the UTF-8 name, the rule's
+# binary AST and the binary AST of its optimized plan.
+MAGIC = b'RSNP'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBqI')
+_ENTRY = struct.Struct('<IqII')
+
+
+def write_snapshot(path, batch_size=500):
+    """Write every stored rule to ``path``; returns ``(rules version, rule
+    count)``, or None if the rules version cannot be read.
+
+    The version is read first, so rules changed while the snapshot is
+    written make it stale rather than wrongly current. The file is written
+    under a temporary name and renamed into place.
+    """
+    version = rules_version()
+    if version is None:
+        return None
+    count = 0
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, version, 0))
+            for rule_name, _, ast_dict, rule_version in iter_rules(batch_size):
+                ast = Node.from_dict(ast_dict)
+                if ast is None:
+                    continue
+                name = rule_name.encode('utf-8')
+                ast_bin = encode_ast(ast)
+                plan_bin = encode_ast(optimize_rule(ast))
+                f.write(_ENTRY.pack(len(name), rule_version, len(ast_bin), len(plan_bin)))
+                f.write(name)
+                f.write(ast_bin)
+                f.write(plan_bin)
+                count += 1
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, version, count))
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return version, count
+
+
+def snapshot_version(path):
+    # Rules version a snapshot was taken at, or None if it is missing or
+    # not a snapshot
+    try:
+        with open(path, 'rb') as f:
+            magic, file_version, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or file_version != VERSION:
+        return None
+    return version
+
+
+def read_snapshot(path, limit=None):
+    """Return ``(rules version, [(rule_name, version, ast, plan), ...])``
+    from a snapshot, reading at most ``limit`` rules."""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                magic, file_version, version, count = _HEADER.unpack_from(view, 0)
+                if magic != MAGIC or file_version != VERSION:
+                    raise ValueError(f"{path} is not a rule snapshot")
+                offset = _HEADER.size
+                rules = []
+                for _ in range(count if limit is None else min(count, limit)):
+                    name_length, rule_version, ast_length, plan_length = _ENTRY.unpack_from(view, offset)
+                    offset += _ENTRY.size
+                    rule_name = str(view[offset:offset + name_length], 'utf-8')
+                    offset += name_length
+                    ast = decode_ast(view[offset:offset + ast_length])
+                    offset += ast_length
+                    plan = decode_ast(view[offset:offset + plan_length])
+                    offset += plan_length
+                    rules.append((rule_name, rule_version, ast, plan))
+            finally:
+                view.release()
+    return version, rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='write a snapshot of the stored rules').add_argument('path')
+    commands.add_parser('info', help='show a snapshot\'s version and whether it is current').add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        written = write_snapshot(args.path)
+        if written is None:
+            print("error: the rules version could not be read from the database", file=sys.stderr)
+            return 1
+        print(f"wrote {written[1]} rules at version {written[0]} to {args.path}")
+        return 0
+
+    version = snapshot_version(args.path)
+    if version is None:
+        print(f"error: {args.path} is not a rule snapshot", file=sys.stderr)
+        return 1
+    current = rules_version()
+    state = 'current' if version == current else f'stale (rules table is at version {current})'
+    print(f"{args.path}: version {version}, {state}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
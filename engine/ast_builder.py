@@ -1,11 +1,23 @@
 import ast
+from engine.evaluator import parse_operand
 
 class Node:
-    def __init__(self, node_type, left=None, right=None, value=None):
+    # Slots keep nodes small; `operand` caches the structured
+    # (field, op, literal) form of an operand's value once it is known
+    __slots__ = ('node_type', 'left', 'right', 'value', 'operand')
+
+    def __init__(self, node_type, left=None, right=None, value=None, operand=None):
         self.node_type = node_type
         self.left = left
         self.right = right
         self.value = value
+        self.operand = operand
+
+    def parsed_operand(self):
+        # (field, op, literal) for an operand node; raises like parse_operand
+        if self.operand is None:
+            self.operand = parse_operand(self.value)
+        return self.operand
 
     def to_dict(self):
         return {
@@ -19,20 +31,164 @@ class Node:
     def from_dict(cls, data):
         if data is None:
             return None
-        return cls(
-            node_type=data['node_type'],
-            value=data.get('value'),  # Use .get to avoid KeyError
-            left=cls.from_dict(data['left']),
-            right=cls.from_dict(data['right'])
-        )
+        if data.get('format') == 'dag':
+            return cls.from_dag_dict(data)
+
+        # Built children first with an explicit stack, so deeply nested
+        # rules do not hit the recursion limit
+        built = {}
+        stack = [(data, False)]
+        while stack:
+            item, expanded = stack.pop()
+            if not expanded:
+                stack.append((item, True))
+                for child in (item['right'], item['left']):
+                    if child is not None:
+                        stack.append((child, False))
+                continue
+            left = item['left']
+            right = item['right']
+            built[id(item)] = cls(
+                node_type=item['node_type'],
+                value=item.get('value'),  # Use .get to avoid KeyError
+                left=built[id(left)] if left is not None else None,
+                right=built[id(right)] if right is not None else None
+            )
+        return built[id(data)]
+
+    def to_dag_dict(self):
+        # Each distinct subtree is written once as [node_type, value, left,
+        # right], with children given as indexes of earlier entries
+        root = NodeTable().intern(self)
+        positions = {}
+        nodes = []
+        for node in post_order(root):
+            positions[id(node)] = len(nodes)
+            nodes.append([
+                node.node_type,
+                node.value,
+                positions[id(node.left)] if node.left is not None else None,
+                positions[id(node.right)] if node.right is not None else None
+            ])
+        return {'format': 'dag', 'root': len(nodes) - 1, 'nodes': nodes}
+
+    @classmethod
+    def from_dag_dict(cls, data):
+        # Shared entries become shared Node objects; built in order, so no recursion
+        nodes = []
+        for node_type, value, left, right in data['nodes']:
+            nodes.append(cls(
+                node_type=node_type,
+                value=value,
+                left=nodes[left] if left is not None else None,
+                right=nodes[right] if right is not None else None
+            ))
+        return nodes[data['root']] if nodes else None
+
+
+class NodeTable:
+    """Hash-consing table: structurally identical subtrees become one Node.
+
+    Interned nodes are shared between every tree that contains them and
+    must not be modified.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def position(self, node):
+        # Stable small integer for an interned node
+        return self._positions[id(node)]
+
+    def intern(self, node):
+        if not isinstance(node, Node):
+            return node
+        canonical = {}
+        for current in post_order(node):
+            left = canonical.get(id(current.left), current.left)
+            right = canonical.get(id(current.right), current.right)
+            try:
+                key = (current.node_type, type(current.value), current.value, id(left), id(right))
+                hash(key)
+            except TypeError:
+                # Unhashable values are never shared
+                key = ('unshared', id(current))
+            interned = self._nodes.get(key)
+            if interned is None:
+                interned = Node(node_type=current.node_type, left=left, right=right,
+                                value=current.value, operand=current.operand)
+                self._nodes[key] = interned
+                self._positions[id(interned)] = len(self._positions)
+            canonical[id(current)] = interned
+        return canonical[id(node)]
+
+
+def post_order(root):
+    # Distinct Node objects reachable from root, children before parents
+    if not isinstance(root, Node):
+        return
+    seen = set()
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in seen:
+            continue
+        if expanded:
+            seen.add(id(node))
+            yield node
+            continue
+        stack.append((node, True))
+        for child in (node.right, node.left):
+            if isinstance(child, Node) and id(child) not in seen:
+                stack.append((child, False))
+
+
+def has_shared_nodes(root):
+    # True if some Node is reachable from root along more than one path
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Node):
+            continue
+        if id(node) in seen:
+            return True
+        seen.add(id(node))
+        stack.append(node.left)
+        stack.append(node.right)
+    return False
+
+
+def tree_depth(root):
+    # Longest root-to-leaf path, counted in nodes, without recursion
+    depths = {}
+    for node in post_order(root):
+        depths[id(node)] = 1 + max(depths.get(id(node.left), 0), depths.get(id(node.right), 0))
+    return depths.get(id(root), 0)
+
+
+# Nested JSON deeper than this is written in the flat DAG form instead, so
+# encoding and decoding it never recurses deeply
+MAX_NESTED_DEPTH = 100
+
+
+def serialize_ast(root):
+    # Storage form of a rule: the compact DAG form when subtrees are shared
+    # or the tree is very deep, the plain nested form otherwise
+    root = NodeTable().intern(root)
+    if has_shared_nodes(root) or tree_depth(root) > MAX_NESTED_DEPTH:
+        return root.to_dag_dict()
+    return root.to_dict()
 
 
 def create_rule(rule_string):
-    print(f"Creating rule from string: {rule_string}")  # Debug output
     # Use `eval` to parse and create the rule expression
     tree = ast.parse(rule_string, mode='eval')
     ast_representation = _tree_to_ast(tree.body)
-    print(f"AST Representation: {ast_representation.to_dict()}")  # Print as dict for better readability
     return ast_representation
 
 
@@ -55,10 +211,12 @@ def _get_operator_string(op):
 def _tree_to_ast(node):
     if isinstance(node, ast.BoolOp):
         op = 'AND' if isinstance(node.op, ast.And) else 'OR'
-        # Handle multiple values for BoolOps (AND/OR)
-        left = _tree_to_ast(node.values[0])
-        right = _tree_to_ast(node.values[1])
-        return Node(node_type='operator', left=left, right=right, value=op)
+        # Handle multiple values for BoolOps (AND/OR): `a and b and c`
+        # becomes ((a AND b) AND c) so no clause is dropped
+        result = _tree_to_ast(node.values[0])
+        for value in node.values[1:]:
+            result = Node(node_type='operator', left=result, right=_tree_to_ast(value), value=op)
+        return result
     
     elif isinstance(node, ast.Compare):
         left = _tree_to_ast(node.left)
@@ -70,9 +228,16 @@ def _tree_to_ast(node):
         else:
             raise ValueError("Unsupported comparator type")
 
-        return Node(node_type='operand', value=f'{left.value} {op} {comparator_value}')
+        value = f'{left.value} {op} {comparator_value}'
+        try:
+            operand = parse_operand(value)
+        except Exception:
+            operand = None  # Reported when the rule is evaluated
+        return Node(node_type='operand', value=value, operand=operand)
 
     elif isinstance(node, ast.Constant):
+        if isinstance(node.value, bool):
+            return Node(node_type='constant', value=node.value)
         return Node(node_type='operand', value=node.value)
 
     elif isinstance(node, ast.Name):
@@ -80,19 +245,31 @@ def _tree_to_ast(node):
 
     return None  # Handle unsupported node types
 
+def flatten_chain(node):
+    # Operands of a chain of same-valued AND/OR nodes, left to right:
+    # ((a AND b) AND (c AND d)) -> [a, b, c, d]
+    children = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Node) and current.node_type == 'operator' and current.value == node.value:
+            stack.append(current.right)
+            stack.append(current.left)
+        else:
+            children.append(current)
+    return children
+
 def combine_rules(rules):
-    nodes = [create_rule(rule) for rule in rules]
-    # Implementing a simple combination logic
+    # Rules are hash-consed into one table, so clauses that appear in several
+    # rules become a single shared node
+    table = NodeTable()
+    nodes = [table.intern(create_rule(rule)) for rule in rules]
     if len(nodes) == 0:
         return None
-    
-    # Create a combined 'AND' node
-    combined_node = Node(node_type='operator', value='AND', left=nodes[0])
-    
-    current_node = combined_node
+
+    # Chain the rules with 'AND' nodes: ((r1 AND r2) AND r3) ...
+    combined_node = nodes[0]
     for node in nodes[1:]:
-        # Combine the current node with the next node
-        current_node.right = node
-        current_node = node  # Move to the next node
-    
+        combined_node = table.intern(Node(node_type='operator', value='AND', left=combined_node, right=node))
+
     return combined_node
@@ -0,0 +1,158 @@
+import json
+import struct
+from engine.ast_builder import Node, NodeTable, post_order
+
+# Binary rule format, version 1 (all integers little-endian):
+#
+#   b"RAST" | version u8 | string count u32 | strings | node count u32 |
+#   node records | root i32
+#
+# Each string is a u32 byte length followed by UTF-8. Nodes are written
+# children first (each distinct subtree once) as fixed-size records, so the
+# whole node section is unpacked in one call:
+#
+#   kind u8 | a u32 | op u8 | tag u8 | payload i64 | left i32 | right i32
+#
+#   AND, OR                 no fields used
+#   STRUCTURED_OPERAND      a = field string, op = operator code, tag says
+#                           whether payload is an int literal or a string
+#                           index
+#   CONSTANT                payload = 0 or 1
+#   GENERIC                 a = node_type string, payload = JSON value string
+#
+# left/right are node indexes, -1 for none. Structured operands are only
+# written when rebuilding the "field op literal" string gives back the
+# stored value exactly; anything else (invalid operands, quoted literals,
+# non-string values) is GENERIC.
+
+MAGIC = b'RAST'
+VERSION = 1
+
+_AND, _OR, _STRUCTURED_OPERAND, _CONSTANT, _GENERIC = range(5)
+_OPS = ('>', '<', '==', '!=', '>=', '<=')
+_OP_CODES = {op: code for code, op in enumerate(_OPS)}
+_INT_LITERAL, _STR_LITERAL = range(2)
+
+_HEADER = struct.Struct('<4sB')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_RECORD = struct.Struct('<BIBBqii')
+_INT64_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+
+def encode_ast(root):
+    """Serialize a rule AST to the compact binary format."""
+    root = NodeTable().intern(root)
+    strings = {}
+    body = bytearray()
+    positions = {}
+
+    def string(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    nodes = list(post_order(root))
+    for node in nodes:
+        positions[id(node)] = len(positions)
+        a = op_code = tag = payload = 0
+        structured = _structured_operand(node)
+        if node.node_type == 'operator' and node.value in ('AND', 'OR'):
+            kind = _AND if node.value == 'AND' else _OR
+        elif structured is not None:
+            field, op, literal = structured
+            kind = _STRUCTURED_OPERAND
+            a = string(field)
+            op_code = _OP_CODES[op]
+            if isinstance(literal, int):
+                tag, payload = _INT_LITERAL, literal
+            else:
+                tag, payload = _STR_LITERAL, string(literal)
+        elif node.node_type == 'constant' and isinstance(node.value, bool):
+            kind = _CONSTANT
+            payload = 1 if node.value else 0
+        else:
+            kind = _GENERIC
+            a = string(node.node_type)
+            payload = string(json.dumps(node.value))
+        body += _RECORD.pack(
+            kind, a, op_code, tag, payload,
+            positions[id(node.left)] if isinstance(node.left, Node) else -1,
+            positions[id(node.right)] if isinstance(node.right, Node) else -1
+        )
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION))
+    out += _U32.pack(len(strings))
+    for text in strings:
+        encoded = text.encode('utf-8')
+        out += _U32.pack(len(encoded))
+        out += encoded
+    out += _U32.pack(len(nodes))
+    out += body
+    out += _I32.pack(positions[id(root)] if isinstance(root, Node) else -1)
+    return bytes(out)
+
+
+def decode_ast(data):
+    """Rebuild a rule AST from ``encode_ast`` output, without recursion."""
+    view = memoryview(data)
+    magic, version = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a binary rule AST")
+    offset = _HEADER.size
+
+    (string_count,) = _U32.unpack_from(view, offset)
+    offset += 4
+    strings = []
+    for _ in range(string_count):
+        (length,) = _U32.unpack_from(view, offset)
+        offset += 4
+        strings.append(str(view[offset:offset + length], 'utf-8'))
+        offset += length
+
+    (node_count,) = _U32.unpack_from(view, offset)
+    offset += 4
+    end = offset + node_count * _RECORD.size
+
+    nodes = []
+    append = nodes.append
+    for kind, a, op_code, tag, payload, left, right in _RECORD.iter_unpack(view[offset:end]):
+        if kind == _STRUCTURED_OPERAND:
+            field = strings[a]
+            op = _OPS[op_code]
+            literal = payload if tag == _INT_LITERAL else strings[payload]
+            node = Node('operand', None, None, f'{field} {op} {literal}', (field, op, literal))
+        elif kind == _AND:
+            node = Node('operator', None, None, 'AND')
+        elif kind == _OR:
+            node = Node('operator', None, None, 'OR')
+        elif kind == _CONSTANT:
+            node = Node('constant', None, None, bool(payload))
+        elif kind == _GENERIC:
+            node = Node(strings[a], None, None, json.loads(strings[payload]))
+        else:
+            raise ValueError(f"Unknown node kind {kind} in binary rule AST")
+        if left >= 0:
+            node.left = nodes[left]
+        if right >= 0:
+            node.right = nodes[right]
+        append(node)
+
+    (root,) = _I32.unpack_from(view, end)
+    return nodes[root] if root >= 0 else None
+
+
+def _structured_operand(node):
+    # (field, op, literal) if the operand string can be rebuilt exactly
+    if node.node_type != 'operand' or not isinstance(node.value, str):
+        return None
+    try:
+        field, op, literal = node.parsed_operand()
+    except Exception:
+        return None
+    if isinstance(literal, int) and not _INT64_RANGE[0] <= literal <= _INT64_RANGE[1]:
+        return None
+    if f'{field} {op} {literal}' != node.value:
+        return None
+    return field, op, literal
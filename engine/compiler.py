@@ -0,0 +1,119 @@
+import operator
+from engine.ast_builder import flatten_chain
+from engine.evaluator import evaluate, compare_all
+
+# Comparison functions used once an operand has been parsed at compile time
+_COMPARATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+}
+
+# Value types that can be compared against a literal without any of the six
+# comparisons in `evaluate` raising; anything else takes the reference path
+# so the error raised (and its message) is exactly the same.
+_SAFE_TYPES = {
+    int: (int, float, bool),
+    str: (str,),
+}
+
+
+def compile_rule(ast, schema=None):
+    """Turn a rule AST into a single callable ``predicate(data) -> bool``.
+
+    Operand strings are parsed and operators resolved once, here, instead of
+    on every call. The returned predicate gives the same results and raises
+    the same errors as ``evaluate(ast, data)``.
+
+    With a ``Schema`` (engine/schema.py), the predicate expects records
+    already passed through ``schema.decode``: operands on schema fields
+    compare the decoded values directly, without re-checking or coercing
+    them on every call.
+    """
+    return _compile(ast, schema)
+
+
+def _compile(ast, schema=None):
+    node_type = getattr(ast, 'node_type', None)
+    if node_type == 'operator':
+        return _compile_operator(ast, schema)
+    elif node_type == 'operand':
+        return _compile_operand(ast, schema)
+    elif node_type == 'constant':
+        value = bool(ast.value)
+        return lambda data: value
+    # Missing children and unknown node types keep the reference behaviour
+    return lambda data: evaluate(ast, data)
+
+
+def _compile_operator(ast, schema):
+    if ast.value not in ('AND', 'OR'):
+        return lambda data: False
+
+    # A chain of same-valued nodes runs as one loop instead of nested calls
+    children = [_compile(child, schema) for child in flatten_chain(ast)]
+
+    # Short-circuit in the same left-to-right order as `evaluate`
+    if ast.value == 'AND':
+        def predicate(data):
+            for child in children:
+                result = child(data)
+                if not result:
+                    return result
+            return result
+    else:
+        def predicate(data):
+            for child in children:
+                result = child(data)
+                if result:
+                    return result
+            return result
+    return predicate
+
+
+def _compile_operand(ast, schema):
+    try:
+        field, op, literal = ast.parsed_operand()
+    except Exception:
+        # Invalid operands only fail when evaluated, in tree order
+        return lambda data: evaluate(ast, data)
+
+    compare = _COMPARATORS[op]
+    safe_types = _SAFE_TYPES[type(literal)]
+
+    def predicate(data):
+        try:
+            value = data.get(field)
+            if value is None:
+                raise ValueError(f"{field} is missing from the input data")
+
+            # Convert value to int if it's numeric
+            if isinstance(value, str) and value.isdigit():
+                value = int(value)
+
+            if type(value) in safe_types:
+                return compare(value, literal)
+            return compare_all(value, literal)[op]
+        except Exception as e:
+            raise ValueError(f"Evaluation error: {str(e)}")
+
+    if schema is None or not schema.comparable(field, literal):
+        return predicate
+
+    # Decoded values of this field already have a type the literal compares
+    # with; only digit-only strings, which evaluate reads as numbers, need
+    # the full path
+    missing = f"Evaluation error: {field} is missing from the input data"
+
+    def typed_predicate(data):
+        value = data.get(field)
+        if value is None:
+            raise ValueError(missing)
+        if type(value) is str and value.isdigit():
+            return predicate(data)
+        return compare(value, literal)
+
+    return typed_predicate
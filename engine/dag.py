@@ -0,0 +1,167 @@
+from engine.ast_builder import Node, NodeTable, flatten_chain, has_shared_nodes, post_order
+from engine.compiler import compile_rule
+from engine.evaluator import evaluate
+
+_UNSET = object()
+
+
+class _Raised:
+    # Memo entry for a node that raised, so the error is raised again
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class SharedRuleSet:
+    """Evaluate many rules over one hash-consed DAG with per-record memoization.
+
+    Rules are interned into a single ``NodeTable``, so a subtree such as
+    ``age > 30`` that appears in several rules is one node. While evaluating
+    a record, each node's result (or error) is memoized, so a shared subtree
+    runs at most once however many rules reach it. Per rule, results and
+    errors are the same as ``evaluate``.
+    """
+
+    def __init__(self):
+        self._table = NodeTable()
+        self._rules = {}      # rule name -> interned root
+        self._sizes = {}      # rule name -> distinct nodes in the rule
+        self._compiled = {}   # id(interned node) -> function(data, memo)
+        self._runs = {}       # rule name -> function(data, memo) for its root
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule_name):
+        return rule_name in self._rules
+
+    def node_count(self):
+        return len(self._table)
+
+    def add_rule(self, rule_name, ast):
+        root = self._table.intern(ast)
+        self._rules[rule_name] = root
+        self._sizes[rule_name] = sum(1 for _ in _distinct_nodes(root))
+        self._compile(root)
+        self._runs[rule_name] = self._child(root)
+
+    def remove_rule(self, rule_name):
+        if self._rules.pop(rule_name, None) is None:
+            return
+        del self._sizes[rule_name]
+        del self._runs[rule_name]
+        # Interned nodes are never freed individually; rebuild the table once
+        # most of it belongs to removed rules
+        if len(self._table) > 2 * sum(self._sizes.values()) + 64:
+            self._rebuild()
+
+    def evaluate(self, data, rule_names=None):
+        """Return ``{rule_name: result}`` for ``data``.
+
+        Rules that raise map to the exception instead of a result.
+        """
+        memo = {}
+        results = {}
+        for rule_name in (self._rules if rule_names is None else rule_names):
+            run = self._runs[rule_name]
+            try:
+                results[rule_name] = run(data, memo)
+            except Exception as e:
+                results[rule_name] = e
+        return results
+
+    def predicate(self, rule_name):
+        # Single-rule predicate(data) that still memoizes shared subtrees
+        run = self._runs[rule_name]
+        return lambda data: run(data, {})
+
+    def _rebuild(self):
+        rules = self._rules
+        self._table = NodeTable()
+        self._rules = {}
+        self._sizes = {}
+        self._compiled = {}
+        self._runs = {}
+        for rule_name, root in rules.items():
+            self.add_rule(rule_name, root)
+
+    def _compile(self, root):
+        # Children before parents, so every child is compiled when needed
+        for node in post_order(root):
+            if node.node_type in ('operator', 'operand') and id(node) not in self._compiled:
+                self._compiled[id(node)] = self._compile_node(node)
+
+    def _compile_node(self, node):
+        if node.node_type == 'operator':
+            if node.value not in ('AND', 'OR'):
+                return lambda data, memo: False
+            children = [self._child(child) for child in flatten_chain(node)]
+            if node.value == 'AND':
+                def compute(data, memo):
+                    for child in children:
+                        result = child(data, memo)
+                        if not result:
+                            return result
+                    return result
+            else:
+                def compute(data, memo):
+                    for child in children:
+                        result = child(data, memo)
+                        if result:
+                            return result
+                    return result
+        elif node.node_type == 'operand':
+            predicate = compile_rule(node)
+
+            def compute(data, memo):
+                return predicate(data)
+
+        return _memoized(self._table.position(node), compute)
+
+    def _child(self, node):
+        if isinstance(node, Node) and node.node_type in ('operator', 'operand'):
+            return self._compiled[id(node)]
+        # Constants, missing children and unknown node types
+        return lambda data, memo: evaluate(node, data)
+
+
+def _memoized(position, compute):
+    def run(data, memo):
+        result = memo.get(position, _UNSET)
+        if result is _UNSET:
+            try:
+                result = compute(data, memo)
+            except Exception as e:
+                memo[position] = _Raised(e)
+                raise
+            memo[position] = result
+        elif result.__class__ is _Raised:
+            raise result.error
+        return result
+    return run
+
+
+def compile_shared(ast):
+    """Like ``compile_rule``, but subtrees that occur more than once in the
+    rule are evaluated once per record."""
+    table_root = NodeTable().intern(ast)
+    if not has_shared_nodes(table_root):
+        return compile_rule(table_root)
+    rule_set = SharedRuleSet()
+    rule_set.add_rule(None, table_root)
+    return rule_set.predicate(None)
+
+
+def _distinct_nodes(root):
+    # Parents before children; each shared node once
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Node) or id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        stack.append(node.right)
+        stack.append(node.left)
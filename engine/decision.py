@@ -0,0 +1,204 @@
+from engine.ast_builder import Node, flatten_chain
+from engine.compiler import compile_rule
+from engine.evaluator import evaluate
+
+
+class _Leaf:
+    __slots__ = ('rule_name',)
+
+    def __init__(self, rule_name=None):
+        self.rule_name = rule_name
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class DecisionDiagram:
+    """First-match classification of records against an ordered rule set.
+
+    ``rules`` maps rule names to ASTs, in priority order; ``classify``
+    returns the name of the first rule the record satisfies, or None. Rules
+    that raise for a record do not match it, as in ``RuleIndex.match``.
+
+    The rules are compiled into one reduced ordered decision diagram over
+    their distinct atomic predicates (operands, by parsed field, operator
+    and literal), ordered by first appearance. Each test node runs one
+    predicate and branches on its outcome: false, true or error, since an
+    error stops a rule's short-circuit evaluation. A record is classified
+    with at most one test per distinct predicate, and tests no outcome
+    depends on are dropped. If the diagram needs more than ``max_nodes``
+    nodes, the compiled rules are evaluated one after another instead;
+    ``compiled`` tells which one is in use.
+
+    Results are the same as ``evaluate`` on each rule in turn, including
+    which records a rule raises for.
+    """
+
+    def __init__(self, rules, max_nodes=10000):
+        self.max_nodes = max_nodes
+        self._names = list(rules)
+        self._atoms = []        # level -> predicate(data)
+        self._atom_keys = {}    # parsed operand (or node id) -> level
+        self._root = None
+        self._fallback = None
+        self._size = 0
+        self._depth = None
+        try:
+            self._root = _Builder(self).build(rules)
+        except (_TooLarge, RecursionError):
+            self._fallback = [(rule_name, compile_rule(ast)) for rule_name, ast in rules.items()]
+        else:
+            self._size, self._depth = _measure(self._root)
+
+    @property
+    def compiled(self):
+        return self._root is not None
+
+    def classify(self, data):
+        if self._root is None:
+            for rule_name, predicate in self._fallback:
+                try:
+                    if predicate(data):
+                        return rule_name
+                except Exception:
+                    pass
+            return None
+        node = self._root
+        while node.__class__ is not _Leaf:
+            atom, if_false, if_true, if_error, _ = node
+            try:
+                node = if_true if atom(data) else if_false
+            except Exception:
+                node = if_error
+        return node.rule_name
+
+    def size(self):
+        # Test nodes in the diagram (0 when falling back)
+        return self._size
+
+    def depth(self):
+        # Most predicates run for any one record (None when falling back)
+        return self._depth
+
+    def stats(self):
+        return {
+            'rules': len(self._names),
+            'atoms': len(self._atoms),
+            'compiled': self.compiled,
+            'nodes': self._size,
+            'depth': self._depth,
+            'max_nodes': self.max_nodes,
+        }
+
+    def _level(self, node):
+        # Operands that parse to the same (field, op, literal) are one atom;
+        # anything else that is not a constant or AND/OR is its own atom
+        try:
+            key = node.parsed_operand() if node.node_type == 'operand' else ('node', id(node))
+        except Exception:
+            key = ('node', id(node))
+        level = self._atom_keys.get(key)
+        if level is None:
+            level = self._atom_keys[key] = len(self._atoms)
+            if isinstance(node, Node) and node.node_type == 'operand':
+                self._atoms.append(compile_rule(node))
+            else:
+                self._atoms.append(lambda data, node=node: evaluate(node, data))
+        return level
+
+
+class _Builder:
+    # Test nodes are (atom, if_false, if_true, if_error, level) tuples,
+    # hash-consed so equal subdiagrams are one object. Rules are built
+    # bottom-up with `_select`, which combines two diagrams pointwise.
+
+    def __init__(self, diagram):
+        self.diagram = diagram
+        self.unique = {}
+        self.false = _Leaf()
+        self.true = _Leaf()
+        self.error = _Leaf()
+
+    def build(self, rules):
+        built = [(rule_name, self._rule(ast)) for rule_name, ast in rules.items()]
+        result = _Leaf()
+        for rule_name, rule in reversed(built):
+            # First match: this rule's leaf where it is true, the rules
+            # after it where it is false or raises
+            result = self._select(rule, result, {self.true: _Leaf(rule_name)})
+        return result
+
+    def _rule(self, node):
+        if isinstance(node, Node) and node.node_type == 'operator':
+            if node.value not in ('AND', 'OR'):
+                return self.false
+            children = [self._rule(child) for child in flatten_chain(node)]
+            # Short-circuit: AND stops at false, OR at true, both at errors
+            stops = {self.false: self.false} if node.value == 'AND' else {self.true: self.true}
+            stops[self.error] = self.error
+            result = children[-1]
+            for child in reversed(children[:-1]):
+                result = self._select(child, result, stops)
+            return result
+        if isinstance(node, Node) and node.node_type == 'constant':
+            return self.true if node.value else self.false
+        level = self.diagram._level(node)
+        return self._node(level, self.false, self.true, self.error)
+
+    def _node(self, level, if_false, if_true, if_error):
+        if if_false is if_true is if_error:
+            return if_false
+        key = (level, id(if_false), id(if_true), id(if_error))
+        node = self.unique.get(key)
+        if node is None:
+            if len(self.unique) >= self.diagram.max_nodes:
+                raise _TooLarge()
+            node = self.unique[key] = (self.diagram._atoms[level], if_false, if_true, if_error, level)
+        return node
+
+    def _select(self, first, then, stops):
+        # Diagram giving stops[leaf] where `first` reaches a leaf in
+        # `stops`, and `then` everywhere else
+        memo = {}
+
+        def select(first, then):
+            if first.__class__ is _Leaf:
+                return stops.get(first, then)
+            key = (id(first), id(then))
+            result = memo.get(key)
+            if result is not None:
+                return result
+            level = first[4]
+            then_level = None if then.__class__ is _Leaf else then[4]
+            if then_level is None or level < then_level:
+                branches = [select(branch, then) for branch in first[1:4]]
+            elif level == then_level:
+                branches = [select(branch, then_branch) for branch, then_branch in zip(first[1:4], then[1:4])]
+            else:
+                level = then_level
+                branches = [select(first, then_branch) for then_branch in then[1:4]]
+            result = memo[key] = self._node(level, *branches)
+            return result
+
+        return select(first, then)
+
+
+def _measure(root):
+    # (test nodes, longest path) of a diagram
+    depths = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node.__class__ is _Leaf:
+            depths[id(node)] = 0
+            stack.pop()
+            continue
+        pending = [child for child in node[1:4] if id(child) not in depths]
+        if pending:
+            stack.extend(pending)
+            continue
+        depths[id(node)] = 1 + max(depths[id(child)] for child in node[1:4])
+        stack.pop()
+    size = sum(1 for depth in depths.values() if depth)
+    return size, depths[id(root)]
@@ -1,21 +1,61 @@
 import re
 
-def evaluate(ast, data):
+# Operand strings look like "age > 30" or "department == Sales"
+OPERAND_PATTERN = re.compile(r"(\w+)\s*(>=|<=|==|!=|>|<)\s*([\w'\" ]+)")
+
+
+def parse_operand(value):
+    # Split an operand string into (field, operator, literal)
+    match = OPERAND_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid operand format: {value}")
+
+    left, op, right = match.groups()
+    return left, op, parse_literal(right)
+
+
+def parse_literal(right):
+    # Handle right value (considering it might be quoted)
+    if right.isdigit():
+        return int(right)
+    return right.strip("'\"")
+
+
+def compare_all(left_value, right_value):
+    return {
+        '>': left_value > right_value,
+        '<': left_value < right_value,
+        '==': left_value == right_value,
+        '!=': left_value != right_value,
+        '>=': left_value >= right_value,
+        '<=': left_value <= right_value
+    }
+
+
+def evaluate(ast, data, trace=None):
+    # `trace`, when a list, receives one entry per node evaluated, in the
+    # order results become known
     if ast.node_type == 'operator':
-        left_result = evaluate(ast.left, data)
-        right_result = evaluate(ast.right, data)
-        
-        print(f"Evaluating: {ast.value} -> left: {left_result}, right: {right_result}")  # Debug output
-        
+        # Short-circuit: the right side is only evaluated when it can
+        # still change the result
         if ast.value == 'AND':
-            return left_result and right_result
+            result = evaluate(ast.left, data, trace) and evaluate(ast.right, data, trace)
         elif ast.value == 'OR':
-            return left_result or right_result
+            result = evaluate(ast.left, data, trace) or evaluate(ast.right, data, trace)
+        else:
+            return False
+
+        if trace is not None:
+            trace.append({'node': ast.value, 'result': result})
+        return result
+
+    elif ast.node_type == 'constant':
+        return bool(ast.value)
 
     elif ast.node_type == 'operand':
         try:
             # Adjusted regex to capture composite conditions
-            match = re.match(r"(\w+)\s*(>=|<=|==|!=|>|<)\s*([\w'\" ]+)", ast.value)
+            match = OPERAND_PATTERN.match(ast.value)
             if not match:
                 raise ValueError(f"Invalid operand format: {ast.value}")
 
@@ -30,25 +70,26 @@ def evaluate(ast, data):
                 left_value = int(left_value)
 
             # Handle right value (considering it might be quoted)
-            if right.isdigit():
-                right_value = int(right)
-            else:
-                right_value = right.strip("'\"")
+            right_value = parse_literal(right)
 
             # Perform comparison based on the operator
-            result = {
-                '>': left_value > right_value,
-                '<': left_value < right_value,
-                '==': left_value == right_value,
-                '!=': left_value != right_value,
-                '>=': left_value >= right_value,
-                '<=': left_value <= right_value
-            }[op]
-
-            print(f"Evaluating {left} {op} {right} -> {result}")  # Debug output
-            return result
+            result = compare_all(left_value, right_value)[op]
 
         except Exception as e:
+            if trace is not None:
+                trace.append({'node': ast.value, 'value': _traced_value(data, ast.value), 'error': str(e)})
             raise ValueError(f"Evaluation error: {str(e)}")
 
+        if trace is not None:
+            trace.append({'node': ast.value, 'value': left_value, 'result': result})
+        return result
+
     return False  # Fallback for unsupported types
+
+
+def _traced_value(data, operand):
+    # Best-effort input value for a trace entry of an operand that failed
+    try:
+        return data.get(OPERAND_PATTERN.match(operand).group(1))
+    except Exception:
+        return None
@@ -0,0 +1,173 @@
+import heapq
+from engine.ast_builder import Node, NodeTable, post_order
+from engine.compiler import compile_rule
+from engine.dag import _Raised
+from engine.evaluator import evaluate
+from engine.optimizer import optimize_rule
+
+_UNSET = object()
+
+
+class _NodeInfo:
+    # `kind` is 'AND', 'OR' or 'leaf'; leaves are evaluated with `compute`
+    __slots__ = ('kind', 'left', 'right', 'compute', 'parents')
+
+    def __init__(self, kind, left=None, right=None, compute=None):
+        self.kind = kind
+        self.left = left
+        self.right = right
+        self.compute = compute
+        self.parents = []
+
+
+class _RecordState:
+    __slots__ = ('data', 'values')
+
+    def __init__(self, data):
+        self.data = data
+        self.values = {}  # node key -> result or _Raised, for nodes evaluated so far
+
+
+class IncrementalEvaluator:
+    """Keep the results of a fixed rule set up to date as records change.
+
+    Rules are optimized and interned into one DAG. For every record the
+    result of each node evaluated so far is kept, and each field maps to the
+    operands that read it. ``update`` recomputes only those operands and the
+    AND/OR nodes above them whose inputs changed, and returns the rules
+    whose outcome changed. Results match ``SharedRuleSet.evaluate`` on the
+    full record: rules that raise map to the exception.
+    """
+
+    def __init__(self, rules):
+        self._table = NodeTable()
+        self._nodes = {None: _NodeInfo('leaf', compute=lambda data: evaluate(None, data))}
+        self._fields = {}   # field -> keys of the operands that read it
+        self._roots = {}    # rule name -> key of its root
+        self._records = {}
+        for rule_name, ast in rules.items():
+            root = self._table.intern(optimize_rule(ast))
+            self._register(root)
+            self._roots[rule_name] = self._key(root)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def add_record(self, record_id, data):
+        """Evaluate every rule on ``data`` and keep the state; returns
+        ``{rule_name: result}``. Replaces any earlier record with this id."""
+        state = _RecordState(dict(data))
+        self._records[record_id] = state
+        return {rule_name: _result(self._get(key, state)) for rule_name, key in self._roots.items()}
+
+    def update(self, record_id, changes):
+        """Apply ``changes`` (field -> new value; None removes the field) to a
+        record and return ``{rule_name: result}`` for the rules whose outcome
+        changed."""
+        state = self._records[record_id]
+        data = state.data
+        dirty = []
+        for field, value in changes.items():
+            old = data.get(field)
+            if value is None:
+                data.pop(field, None)
+            else:
+                data[field] = value
+            if type(old) is type(value) and old == value:
+                continue
+            for key in self._fields.get(field, ()):
+                if key in state.values:
+                    dirty.append(key)
+
+        # Keys grow from children to parents, so popping the smallest key
+        # recomputes every node after all of its changed children
+        heapq.heapify(dirty)
+        queued = set(dirty)
+        changed = set()
+        values = state.values
+        while dirty:
+            key = heapq.heappop(dirty)
+            old = values[key]
+            new = self._compute(key, state)
+            values[key] = new
+            if _same(old, new):
+                continue
+            changed.add(key)
+            for parent in self._nodes[key].parents:
+                if parent in values and parent not in queued:
+                    queued.add(parent)
+                    heapq.heappush(dirty, parent)
+
+        return {rule_name: _result(values[key])
+                for rule_name, key in self._roots.items() if key in changed}
+
+    def results(self, record_id):
+        state = self._records[record_id]
+        return {rule_name: _result(self._get(key, state)) for rule_name, key in self._roots.items()}
+
+    def remove_record(self, record_id):
+        self._records.pop(record_id, None)
+
+    def _key(self, node):
+        return self._table.position(node) if isinstance(node, Node) else None
+
+    def _register(self, root):
+        if not isinstance(root, Node):
+            return
+        for node in post_order(root):
+            key = self._table.position(node)
+            if key in self._nodes:
+                continue
+            if node.node_type == 'operator' and node.value in ('AND', 'OR'):
+                info = _NodeInfo(node.value, self._key(node.left), self._key(node.right))
+                for child in (info.left, info.right):
+                    if child is not None:
+                        self._nodes[child].parents.append(key)
+            elif node.node_type == 'operand':
+                info = _NodeInfo('leaf', compute=compile_rule(node))
+                try:
+                    field = node.parsed_operand()[0]
+                except Exception:
+                    field = None  # Raises for every record
+                if field is not None:
+                    self._fields.setdefault(field, []).append(key)
+            else:
+                # Constants, unknown operators and node types never change
+                info = _NodeInfo('leaf', compute=lambda data, node=node: evaluate(node, data))
+            self._nodes[key] = info
+
+    def _get(self, key, state):
+        value = state.values.get(key, _UNSET)
+        if value is _UNSET:
+            value = state.values[key] = self._compute(key, state)
+        return value
+
+    def _compute(self, key, state):
+        # Short-circuits like evaluate: the right child is only evaluated
+        # (and only kept in the state) when it decides the result
+        info = self._nodes[key]
+        if info.kind == 'leaf':
+            try:
+                return info.compute(state.data)
+            except Exception as e:
+                return _Raised(e)
+        left = self._get(info.left, state)
+        if left.__class__ is _Raised:
+            return left
+        if (info.kind == 'AND') == (not left):
+            return left
+        return self._get(info.right, state)
+
+
+def _same(old, new):
+    if old.__class__ is _Raised or new.__class__ is _Raised:
+        return (old.__class__ is new.__class__
+                and type(old.error) is type(new.error) and str(old.error) == str(new.error))
+    return type(old) is type(new) and old == new
+
+
+def _result(value):
+    return value.error if value.__class__ is _Raised else value
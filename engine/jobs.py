@@ -0,0 +1,231 @@
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from db.jobs import FAILED, SUCCEEDED
+from engine.run import missing_as_none, file_format, read_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Batch evaluation jobs run by a fixed pool of background threads.
+
+    A job evaluates stored rules over a list of records or an input file
+    (CSV, JSONL or Parquet, under ``input_dir`` only). ``submit`` stores it
+    and returns at once; results are written to the store ``chunk_size``
+    records at a time, which is also how often progress is updated and a
+    cancellation noticed. At most ``max_queued`` jobs may wait; ``submit``
+    raises QueueFull beyond that.
+
+    ``load_rule(name)`` returns a PreparedRule or None and ``schemas`` is
+    the SchemaRegistry records are decoded with. Nothing runs until
+    ``start``. Once started, the queue sends a heartbeat for its running
+    jobs every ``lease / 3`` seconds and picks up queued jobs from the
+    store, including running jobs whose owner (e.g. a process that was
+    restarted) sent none for ``lease`` seconds; those continue from their
+    first unstored record. Several processes may share one store.
+    """
+
+    def __init__(self, store, load_rule, schemas, workers=2, max_queued=100, input_dir=None, chunk_size=1000,
+                 lease=60.0):
+        self.store = store
+        self.load_rule = load_rule
+        self.schemas = schemas
+        self.workers = workers
+        self.max_queued = max_queued
+        self.input_dir = os.path.realpath(input_dir) if input_dir else None
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._pending = queue.Queue()
+        self._waiting = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def start(self):
+        # With no workers the process only queues jobs, for other processes
+        # sharing the store to run
+        with self._lock:
+            if self._threads or not self.workers:
+                return
+            self._threads.append(threading.Thread(target=self._monitor, name='job-monitor', daemon=True))
+            for number in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, rule_ids, records=None, input_path=None, schema=None):
+        """Queue a job; returns its id.
+
+        Raises ValueError for an invalid job, LookupError for an unknown
+        rule or schema and QueueFull when too many jobs are waiting.
+        """
+        if not isinstance(rule_ids, list) or not rule_ids or not all(isinstance(name, str) for name in rule_ids):
+            raise ValueError('rule_ids must be a non-empty list of rule names')
+        if (records is None) == (input_path is None):
+            raise ValueError('Give either records or input_path')
+        for rule_name in rule_ids:
+            if self.load_rule(rule_name) is None:
+                raise LookupError(f"Rule '{rule_name}' not found")
+        if schema is not None and self.schemas.get(schema) is None:
+            raise LookupError(f"Unknown schema '{schema}'")
+
+        spec = {'rule_ids': rule_ids, 'schema': schema}
+        if records is not None:
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError('records must be a list of objects')
+            total = len(records)
+        else:
+            spec['input_path'] = self._input_file(input_path)
+            spec['format'] = file_format(spec['input_path'])
+            # Counted when the job starts
+            total = None
+
+        job_id = uuid.uuid4().hex
+        if not self.store.create_job(job_id, spec, total, self.max_queued, records):
+            raise QueueFull(f'{self.max_queued} jobs are already queued')
+        self._enqueue(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        # Status afterwards, or None for an unknown job; a running job stops
+        # before it stores its next chunk
+        return self.store.cancel_job(job_id)
+
+    def stats(self):
+        return {
+            'started': self.started,
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'jobs': self.store.counts(),
+        }
+
+    def _input_file(self, input_path):
+        if self.input_dir is None:
+            raise ValueError('File jobs are disabled; set JOB_INPUT_DIR')
+        if not isinstance(input_path, str) or not input_path:
+            raise ValueError('input_path must be a file name')
+        path = os.path.realpath(os.path.join(self.input_dir, input_path))
+        if os.path.commonpath([path, self.input_dir]) != self.input_dir:
+            raise ValueError('input_path must be inside the job input directory')
+        if not os.path.isfile(path):
+            raise LookupError(f"Input file '{input_path}' not found")
+        return path
+
+    def _enqueue(self, job_id):
+        # Each job waits in the local queue at most once
+        with self._lock:
+            if job_id in self._waiting:
+                return
+            self._waiting.add(job_id)
+        self._pending.put(job_id)
+
+    def _monitor(self):
+        while True:
+            try:
+                self.store.heartbeat(self.owner)
+                for job_id in self.store.claimable(self.lease):
+                    self._enqueue(job_id)
+            except Exception:
+                logger.exception("Job heartbeat failed")
+            time.sleep(self.lease / 3)
+
+    def _work(self):
+        while True:
+            job_id = self._pending.get()
+            with self._lock:
+                self._waiting.discard(job_id)
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception(f"Job {job_id} could not be run")
+
+    def _run(self, job_id):
+        if not self.store.start_job(job_id, self.owner):
+            # Cancelled while queued, or claimed by another process
+            return
+        job = self.store.get_job(job_id)
+        spec = job['spec']
+        try:
+            rules = {}
+            for rule_name in spec['rule_ids']:
+                rule = self.load_rule(rule_name)
+                if rule is None:
+                    raise LookupError(f"Rule '{rule_name}' not found")
+                rules[rule_name] = rule
+            if 'input_path' in spec:
+                chunks = self._file_chunks(job_id, rules, spec, job['processed'], job['total'])
+            else:
+                chunks = self._record_chunks(job_id, rules, spec, job['processed'], job['total'])
+            for position, results in chunks:
+                if not self.store.add_results(job_id, self.owner, position, results):
+                    logger.info(f"Job {job_id} stopped: cancelled or taken over")
+                    return
+        except Exception as e:
+            logger.warning(f"Job {job_id} failed: {e}")
+            self.store.finish_job(job_id, self.owner, FAILED, str(e))
+            return
+        self.store.finish_job(job_id, self.owner, SUCCEEDED)
+
+    def _record_chunks(self, job_id, rules, spec, start, total):
+        for position in range(start, total, self.chunk_size):
+            records = self.store.records(job_id, position, self.chunk_size)
+            yield position, self._evaluate(rules, spec, records)
+
+    def _file_chunks(self, job_id, rules, spec, start, total):
+        path, fmt = spec['input_path'], spec['format']
+        if total is None:
+            total = sum(len(chunk) for chunk in read_chunks(path, self.chunk_size, fmt))
+            self.store.set_total(job_id, total)
+        position = 0
+        for chunk in read_chunks(path, self.chunk_size, fmt):
+            # Skip rows already stored before a restart
+            if position + len(chunk) <= start:
+                position += len(chunk)
+                continue
+            if position < start:
+                chunk = chunk.iloc[start - position:]
+                position = start
+            # Empty cells are missing fields, as in engine.run
+            records = missing_as_none(chunk).to_dict('records')
+            yield position, self._evaluate(rules, spec, records)
+            position += len(chunk)
+
+    def _evaluate(self, rules, spec, records):
+        # Records from either source are decoded with the job's schema and
+        # run through every rule's plan for it; a rule that raises gives
+        # null and its error message
+        schema = self.schemas.get(spec['schema'])
+        return [_evaluate_record(rules, schema, record) for record in records]
+
+
+def _evaluate_record(rules, schema, record):
+    results = {}
+    errors = {}
+    try:
+        record = schema.decode(record)
+    except Exception as e:
+        return {'results': dict.fromkeys(rules), 'errors': {'record': str(e)}}
+    for rule_name, rule in rules.items():
+        try:
+            results[rule_name] = bool(rule.for_schema(schema)(record))
+        except Exception as e:
+            results[rule_name] = None
+            errors[rule_name] = str(e)
+    result = {'results': results}
+    if errors:
+        result['errors'] = errors
+    return result
+
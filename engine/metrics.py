@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket
+# catches everything slower
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self):
+        buckets = {f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'buckets': buckets,
+        }
+
+
+class _Counter:
+    __slots__ = ('calls', 'errors', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+class Metrics:
+    """In-process counters and latency histograms for rule evaluation and
+    database access. Recording is a dict lookup and a few additions under a
+    lock, cheap enough to leave on for every request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._db = {}
+        self._startup = {}
+
+    def record_evaluation(self, rule_name, seconds, error=False):
+        self._record(self._rules, rule_name, seconds, error)
+
+    def record_db(self, operation, seconds, error=False):
+        self._record(self._db, operation, seconds, error)
+
+    def record_startup(self, **values):
+        # Cold-start measurements (seconds, counts), kept until reset
+        with self._lock:
+            self._startup.update(values)
+
+    def _record(self, counters, name, seconds, error):
+        with self._lock:
+            counter = counters.get(name)
+            if counter is None:
+                counter = counters[name] = _Counter()
+            counter.calls += 1
+            if error:
+                counter.errors += 1
+            counter.latency.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._rules.clear()
+            self._db.clear()
+            self._startup.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'rules': {name: _counter_dict(counter) for name, counter in self._rules.items()},
+                'db': {name: _counter_dict(counter) for name, counter in self._db.items()},
+                'startup': dict(self._startup),
+            }
+
+
+def _counter_dict(counter):
+    return {'calls': counter.calls, 'errors': counter.errors, 'latency': counter.latency.to_dict()}
+
+
+# Process-wide registry used by the app and the database layer
+metrics = Metrics()
@@ -0,0 +1,223 @@
+from engine.ast_builder import Node, flatten_chain
+from engine.compiler import compile_rule
+
+# Estimated fraction of records an operand is true for, used when no
+# observed selectivity is available
+_DEFAULT_SELECTIVITY = {
+    '==': 0.1,
+    '!=': 0.9,
+    '>': 1 / 3,
+    '<': 1 / 3,
+    '>=': 1 / 3,
+    '<=': 1 / 3,
+}
+
+
+class _Term:
+    # Optimizer view of a rule: an operand, an n-ary AND/OR or a constant
+    __slots__ = ('kind', 'node', 'key', 'children', 'cost', 'selectivity', 'safe')
+
+    def __init__(self, kind, key, node=None, children=None, cost=1.0, selectivity=0.5, safe=False):
+        self.kind = kind
+        self.key = key
+        self.node = node
+        self.children = children
+        self.cost = cost
+        self.selectivity = selectivity
+        # True when the term cannot raise for any record it is given
+        self.safe = safe
+
+
+def predicate_key(node):
+    """Canonical key of an operand node, e.g. ``"age > 30"``."""
+    try:
+        field, op, literal = node.parsed_operand()
+        return f"{field} {op} {literal!r}"
+    except Exception:
+        return f"raw {node.value!r}"
+
+
+def optimize_rule(ast, selectivity=None, schema=None):
+    """Rewrite a rule AST so it evaluates with less work.
+
+    AND/OR chains are flattened into n-ary nodes, duplicate operands are
+    removed, constants are folded, and the children of each node are ordered
+    so cheap and decisive checks run first: for AND the ones most likely to
+    be false, for OR the ones most likely to be true. ``selectivity`` maps
+    ``predicate_key`` strings to the observed fraction of records the operand
+    is true for (see ``measure_selectivity``); without it, estimates based on
+    the operator are used.
+
+    The result is an ordinary ``Node`` tree that gives the same result, and
+    raises the same errors, as the original for every record. Only checks
+    that cannot raise are reordered, and never across one that can: with a
+    ``Schema``, for records passed through ``schema.decode``, those are the
+    operands on required int, float and bool fields with a literal they
+    compare with. Without a schema any field may be missing, so the order
+    is kept.
+    """
+    term = _build(ast, selectivity or {}, schema)
+    return _to_node(term)
+
+
+def measure_selectivity(ast, records):
+    """Fraction of ``records`` each distinct operand of ``ast`` is true for.
+
+    Records an operand cannot be evaluated on are ignored for that operand.
+    """
+    counts = {}
+    for node in _operands(ast):
+        key = predicate_key(node)
+        if key in counts:
+            continue
+        predicate = compile_rule(node)
+        true_count = total = 0
+        for record in records:
+            try:
+                true_count += bool(predicate(record))
+            except Exception:
+                continue
+            total += 1
+        if total:
+            counts[key] = true_count / total
+    return counts
+
+
+def _operands(ast):
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Node):
+            continue
+        if node.node_type == 'operand':
+            yield node
+        elif node.node_type == 'operator':
+            stack.append(node.right)
+            stack.append(node.left)
+
+
+def _build(node, selectivity, schema):
+    node_type = getattr(node, 'node_type', None)
+    if node_type == 'operator':
+        if node.value not in ('AND', 'OR'):
+            return _constant(False)
+        return _combine(node.value, [_build(child, selectivity, schema) for child in flatten_chain(node)])
+
+    elif node_type == 'operand':
+        key = predicate_key(node)
+        estimate = selectivity.get(key)
+        try:
+            field, op, literal = node.parsed_operand()
+        except Exception:
+            return _Term('operand', key, node=node, selectivity=0.5 if estimate is None else estimate)
+        if estimate is None:
+            estimate = _DEFAULT_SELECTIVITY[op]
+        return _Term('operand', key, node=node, selectivity=estimate, safe=_cannot_raise(schema, field, literal))
+
+    elif node_type == 'constant':
+        return _constant(bool(node.value))
+
+    elif node is None:
+        # A missing child always raises; keep it so the error is preserved
+        return _Term('opaque', 'missing', node=None)
+
+    # Unknown node types evaluate to False
+    return _constant(False)
+
+
+def _cannot_raise(schema, field, literal):
+    # Decoded records always hold required fields, with the field's type.
+    # Not str fields: evaluate reads digit-only strings as numbers, which
+    # do not compare with str literals
+    return (schema is not None and field in schema.fields and schema.fields[field].required
+            and schema.fields[field].type != 'str' and schema.comparable(field, literal))
+
+
+def _constant(value):
+    return _Term('constant', f"constant {value}", node=value,
+                 cost=0.0, selectivity=1.0 if value else 0.0, safe=True)
+
+
+def _combine(op, children):
+    # AND is decided by a false child and OR by a true one
+    absorbing = op == 'OR'
+
+    flat = []
+    seen = set()
+    for candidate in _flattened(op, children):
+        if candidate.kind == 'constant' and candidate.node != absorbing:
+            continue
+        if candidate.key in seen:
+            continue
+        seen.add(candidate.key)
+        flat.append(candidate)
+        if candidate.kind == 'constant':
+            # Decides the result; the children before it still run first
+            break
+
+    # Order by expected cost per chance of deciding the result, keeping the
+    # original order for ties. Only runs of children that cannot raise are
+    # reordered: moving a check past one that can raise would change which
+    # records raise.
+    if op == 'AND':
+        rank = lambda t: t.cost / (1 - t.selectivity) if t.selectivity < 1 else float('inf')
+    else:
+        rank = lambda t: t.cost / t.selectivity if t.selectivity > 0 else float('inf')
+    ordered = []
+    run = []
+    for child in flat + [None]:
+        if child is not None and child.safe:
+            run.append(child)
+            continue
+        ordered.extend(sorted(run, key=rank))
+        run = []
+        if child is not None:
+            ordered.append(child)
+    # Nothing after a deciding constant runs
+    for index, child in enumerate(ordered):
+        if child.kind == 'constant':
+            ordered = ordered[:index + 1]
+            break
+    flat = ordered
+
+    if not flat:
+        return _constant(not absorbing)
+    if flat[0].kind == 'constant':
+        return flat[0]
+    if len(flat) == 1:
+        return flat[0]
+
+    # Expected cost with short-circuiting, assuming independent operands
+    cost = 0.0
+    undecided = 1.0
+    for child in flat:
+        cost += undecided * child.cost
+        undecided *= (1 - child.selectivity) if op == 'OR' else child.selectivity
+    combined = 1 - undecided if op == 'OR' else undecided
+
+    # Children that cannot raise may run in any order, so their order is
+    # not part of the key
+    safe = all(child.safe for child in flat)
+    keys = [child.key for child in flat]
+    key = f"{op}({','.join(sorted(keys) if safe else keys)})"
+    return _Term(op, key, children=flat, cost=cost, selectivity=combined, safe=safe)
+
+
+def _flattened(op, children):
+    for child in children:
+        if child.kind == op:
+            yield from child.children
+        else:
+            yield child
+
+
+def _to_node(term):
+    if term.kind == 'constant':
+        return Node(node_type='constant', value=term.node)
+    elif term.kind in ('operand', 'opaque'):
+        return term.node
+
+    result = _to_node(term.children[0])
+    for child in term.children[1:]:
+        result = Node(node_type='operator', value=term.kind, left=result, right=_to_node(child))
+    return result
@@ -0,0 +1,141 @@
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from engine.ast_builder import Node, create_rule, post_order
+from engine.binary import encode_ast, decode_ast
+from engine.dag import SharedRuleSet
+from engine.optimizer import optimize_rule
+
+# Rule set of the current worker process, built once by _init_worker
+_worker_rules = None
+
+
+class ParallelEvaluator:
+    """Evaluate a rule set against many records on a pool of worker processes.
+
+    ``rules`` maps rule names to ASTs. The rule set is encoded once and
+    sent to each worker when it starts; records are then sent in chunks of
+    ``chunk_size``. Results come back in input order, one
+    ``{rule_name: result}`` dict per record, with the same results as the
+    API (rules run in their optimized form). A rule that raises on a record
+    maps to the exception instead of a result, and the rest of the job
+    carries on.
+    """
+
+    def __init__(self, rules, workers=None, chunk_size=1000, max_pending=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # Chunks in flight at once; bounds memory when records are streamed
+        self.max_pending = max_pending or 2 * self.workers
+        encoded = {rule_name: encode_ast(ast) for rule_name, ast in rules.items()}
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(encoded,)
+        )
+
+    def map(self, records):
+        """Yield the results for ``records`` (any iterable), in order."""
+        records = iter(records)
+        pending = deque()
+        while True:
+            while len(pending) < self.max_pending:
+                chunk = list(itertools.islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(self._executor.submit(_evaluate_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def evaluate_parallel(rules, records, workers=None, chunk_size=1000):
+    # List of {rule_name: result} per record, in input order
+    with ParallelEvaluator(rules, workers=workers, chunk_size=chunk_size) as evaluator:
+        return list(evaluator.map(records))
+
+
+def parse_rules(rule_strings, workers=None, chunk_size=200):
+    """Parse and validate rule strings, in parallel when there are many.
+
+    Returns one entry per rule string, in order: the AST, or the exception
+    that makes the rule invalid (a syntax error, an unsupported expression
+    or an operand that does not parse).
+    """
+    rule_strings = list(rule_strings)
+    if workers == 1 or len(rule_strings) <= chunk_size:
+        # Not worth starting processes for
+        return [_parse_or_error(rule_string) for rule_string in rule_strings]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # ASTs come back in the binary format, which decodes without recursion
+        for ok, value in executor.map(_parse_encoded, rule_strings, chunksize=chunk_size):
+            results.append(decode_ast(value) if ok else value)
+    return results
+
+
+def parse_rule(rule_string):
+    # create_rule, but rejecting rules that would fail on every evaluation
+    if not isinstance(rule_string, str):
+        raise ValueError("Rule must be a string")
+    ast = create_rule(rule_string)
+    if ast is None:
+        raise ValueError(f"Unsupported rule expression: {rule_string}")
+    return _checked(ast)
+
+
+def parse_rule_dict(data):
+    # parse_rule for a stored AST (Node.to_dict or to_dag_dict form), as
+    # found in exports; rule strings of combined rules may not parse
+    try:
+        ast = Node.from_dict(data)
+    except (AttributeError, IndexError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid rule AST: {e!r}")
+    if ast is None:
+        raise ValueError("Invalid rule AST: empty")
+    return _checked(ast)
+
+
+def _checked(ast):
+    for node in post_order(ast):
+        if node.node_type == 'operand':
+            node.parsed_operand()
+    return ast
+
+
+def _parse_or_error(rule_string):
+    try:
+        return parse_rule(rule_string)
+    except Exception as e:
+        return e
+
+
+def _parse_encoded(rule_string):
+    result = _parse_or_error(rule_string)
+    if isinstance(result, Exception):
+        return False, result
+    return True, encode_ast(result)
+
+
+def _init_worker(encoded):
+    global _worker_rules
+    _worker_rules = SharedRuleSet()
+    for rule_name, data in encoded.items():
+        _worker_rules.add_rule(rule_name, optimize_rule(decode_ast(data)))
+
+
+def _evaluate_chunk(records):
+    return [_worker_rules.evaluate(record) for record in records]
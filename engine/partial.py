@@ -0,0 +1,75 @@
+from engine.ast_builder import Node, flatten_chain
+from engine.compiler import compile_rule
+
+
+def partial_evaluate(ast, context):
+    """Specialize a rule to the field values in ``context``.
+
+    Operands on fields in ``context`` are evaluated now, decided branches
+    are dropped, and the residual rule is returned as a new tree (the input
+    is not changed); it is a single ``constant`` node when the context
+    decides the rule. For any record that holds the context's values, the
+    residual gives the same result as the original and raises where it
+    raises: a known operand that raises is kept, as are operands evaluated
+    before a deciding one, since they could still raise.
+    """
+    return _residual(ast, context, {})
+
+
+def is_constant(ast):
+    return isinstance(ast, Node) and ast.node_type == 'constant'
+
+
+def _residual(node, context, memo):
+    # Shared subtrees (e.g. from combine_rules) are specialized once
+    result = memo.get(id(node))
+    if result is None:
+        result = memo[id(node)] = _specialize(node, context, memo)
+    return result
+
+
+def _specialize(node, context, memo):
+    if not isinstance(node, Node):
+        return node
+    if node.node_type == 'operand':
+        return _specialize_operand(node, context)
+    if node.node_type != 'operator':
+        return node
+    if node.value not in ('AND', 'OR'):
+        return Node(node_type='constant', value=False)
+
+    # AND stops at the first false child and skips true ones; OR the reverse
+    stop = node.value == 'OR'
+    children = []
+    for child in flatten_chain(node):
+        child = _residual(child, context, memo)
+        if is_constant(child):
+            if bool(child.value) != stop:
+                continue
+            if not children:
+                return Node(node_type='constant', value=stop)
+            # Earlier children still run (and may raise) before this one
+            children.append(child)
+            break
+        children.append(child)
+
+    if not children:
+        return Node(node_type='constant', value=not stop)
+    result = children[0]
+    for child in children[1:]:
+        result = Node(node_type='operator', value=node.value, left=result, right=child)
+    return result
+
+
+def _specialize_operand(node, context):
+    try:
+        field = node.parsed_operand()[0]
+    except Exception:
+        return node
+    if context.get(field) is None:
+        return node
+    try:
+        return Node(node_type='constant', value=bool(compile_rule(node)(context)))
+    except Exception:
+        # Raises for every record holding this value; keep it to raise there
+        return node
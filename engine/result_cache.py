@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict
+from engine.ast_builder import post_order
+from engine.dag import _Raised
+
+
+def referenced_fields(ast):
+    """Sorted tuple of the record fields a rule's operands read.
+
+    A rule's result depends only on these fields (operands that do not
+    parse read none and always raise).
+    """
+    fields = set()
+    for node in post_order(ast):
+        if node.node_type == 'operand':
+            try:
+                fields.add(node.parsed_operand()[0])
+            except Exception:
+                pass
+    return tuple(sorted(fields))
+
+
+class _RuleStats:
+    __slots__ = ('hits', 'misses')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache of rule results.
+
+    Results are keyed on the rule name and version and the projection of
+    the record onto the fields the rule reads, so records that agree on
+    those fields share one entry. Errors are cached like results. Entries
+    expire ``ttl`` seconds after they are stored (None keeps them until
+    evicted); ``rules``, when given, limits caching to those rule names.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, rules=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.rules = frozenset(rules) if rules else None
+        self._entries = OrderedDict()  # key -> (result or _Raised, expires_at)
+        self._keys = {}                # rule name -> keys of its entries
+        self._rule_stats = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def enabled_for(self, rule_name):
+        return self.max_size > 0 and (self.rules is None or rule_name in self.rules)
+
+    def evaluate(self, rule, data, predicate=None, variant=None):
+        """Result of the prepared ``rule`` on ``data``, from the cache when
+        possible; raises like the rule.
+
+        ``predicate`` replaces the rule's own compiled predicate (e.g. one
+        for schema-decoded records); ``variant`` tells such predicates apart
+        in the cache key.
+        """
+        run = predicate or rule
+        if not self.enabled_for(rule.rule_name):
+            return run(data)
+        try:
+            key = (rule.rule_name, rule.version, variant,
+                   tuple(_projected(data.get(field)) for field in rule.fields))
+            hash(key)
+        except (AttributeError, TypeError):
+            # Not a dict, or a field value that cannot be a key
+            return run(data)
+
+        now = time.monotonic()
+        with self._lock:
+            stats = self._rule_stats.get(rule.rule_name)
+            if stats is None:
+                stats = self._rule_stats[rule.rule_name] = _RuleStats()
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                stats.hits += 1
+            else:
+                self.misses += 1
+                stats.misses += 1
+
+        if entry is not None:
+            result = entry[0]
+        else:
+            try:
+                result = run(data)
+            except Exception as e:
+                result = _Raised(e)
+            self._put(key, result, now + self.ttl if self.ttl else None)
+
+        if result.__class__ is _Raised:
+            raise result.error
+        return result
+
+    def _put(self, key, result, expires_at):
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            self._keys.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[0]]
+
+    def invalidate(self, rule_name):
+        # Entries of an older version can never be hit again; drop them now
+        with self._lock:
+            keys = self._keys.pop(rule_name, ())
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'rules': {
+                    rule_name: {
+                        'hits': stats.hits,
+                        'misses': stats.misses,
+                        'size': len(self._keys.get(rule_name, ())),
+                        'hit_rate': stats.hits / (stats.hits + stats.misses),
+                    }
+                    for rule_name, stats in self._rule_stats.items()
+                },
+            }
+
+
+def _projected(value):
+    # 1, 1.0 and True are equal keys but not the same input: keep the type
+    return type(value), value
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from engine.compiler import compile_rule
+from engine.dag import compile_shared
+from engine.evaluator import evaluate
+from engine.optimizer import optimize_rule
+from engine.partial import partial_evaluate
+from engine.result_cache import referenced_fields
+
+# Residual rules kept per prepared rule
+MAX_RESIDUALS = 256
+
+
+class PreparedRule:
+    """A compiled rule together with the AST and version it was built from."""
+
+    __slots__ = ('rule_name', 'version', 'ast', 'plan', 'predicate', 'fields', '_typed', '_residuals')
+
+    def __init__(self, rule_name, version, ast, plan=None):
+        self.rule_name = rule_name
+        self.version = version
+        self.ast = ast
+        # The optimized tree that the compiled predicate runs (given when it
+        # was optimized ahead of time, e.g. in a snapshot)
+        self.plan = optimize_rule(ast) if plan is None else plan
+        self.predicate = compile_shared(self.plan)
+        # Fields the plan reads, for ResultCache keys
+        self.fields = referenced_fields(self.plan)
+        self._typed = {}
+        self._residuals = {}
+
+    def for_schema(self, schema):
+        # Predicate over records decoded by `schema`, compiled on first use
+        return self._typed_plan(schema)[1]
+
+    def _typed_plan(self, schema):
+        # (plan, predicate) for records decoded by `schema`; the plan may
+        # reorder checks the schema guarantees cannot raise
+        typed = self._typed.get(schema.name)
+        if typed is None:
+            plan = optimize_rule(self.ast, schema=schema)
+            typed = self._typed[schema.name] = (plan, compile_rule(plan, schema))
+        return typed
+
+    def residual(self, context):
+        """The rule specialized to ``context`` (see ``partial_evaluate``).
+
+        Residuals are cached by the context's values for the fields the rule
+        reads; the cache is dropped when it fills up.
+        """
+        try:
+            key = tuple((field, type(context[field]), context[field])
+                        for field in referenced_fields(self.ast) if field in context)
+            residual = self._residuals.get(key)
+        except TypeError:
+            # A value that cannot be a key
+            return partial_evaluate(self.ast, context)
+        if residual is None:
+            if len(self._residuals) >= MAX_RESIDUALS:
+                self._residuals.clear()
+            residual = self._residuals[key] = partial_evaluate(self.ast, context)
+        return residual
+
+    def __call__(self, data):
+        return self.predicate(data)
+
+    def evaluate_traced(self, data, trace, schema=None):
+        # Same result as calling the rule (or its `for_schema` predicate), but
+        # walks the plan with the reference evaluator and appends every node
+        # visited to `trace`
+        plan = self.plan if schema is None else self._typed_plan(schema)[0]
+        return evaluate(plan, data, trace)
+
+
+class _Entry:
+    __slots__ = ('rule', 'checked_at')
+
+    def __init__(self, rule, checked_at):
+        self.rule = rule
+        self.checked_at = checked_at
+
+
+class RuleCache:
+    """Bounded LRU cache of prepared rules, keyed by rule name and version.
+
+    ``load_rule(rule_name)`` returns ``(ast, version)`` or None and
+    ``get_version(rule_name)`` returns the stored version or None. Entries
+    older than ``revalidate_after`` seconds are checked against the stored
+    version before use, so changes made by other processes are picked up
+    within that time; changes made in this process should call
+    ``invalidate``.
+    """
+
+    def __init__(self, load_rule, get_version, max_size=1024, revalidate_after=5.0):
+        self.load_rule = load_rule
+        self.get_version = get_version
+        self.max_size = max_size
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so a load that raced with one is not cached
+        self._generation = 0
+
+    def get(self, rule_name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(rule_name)
+            if entry is not None:
+                self._entries.move_to_end(rule_name)
+
+        if entry is not None:
+            if now - entry.checked_at < self.revalidate_after:
+                self._count_hit()
+                return entry.rule
+            if self.get_version(rule_name) == entry.rule.version:
+                entry.checked_at = now
+                self._count_hit()
+                return entry.rule
+
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+
+        loaded = self.load_rule(rule_name)
+        if loaded is None:
+            self.invalidate(rule_name)
+            return None
+
+        ast, version = loaded
+        rule = PreparedRule(rule_name, version, ast)
+        self._put(rule_name, _Entry(rule, now), generation)
+        return rule
+
+    def preload(self, rules):
+        """Cache already prepared rules, e.g. from a snapshot, as if each had
+        just been loaded; returns how many were cached."""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+        count = 0
+        for rule in rules:
+            if count >= self.max_size:
+                break
+            self._put(rule.rule_name, _Entry(rule, now), generation)
+            count += 1
+        return count
+
+    def _count_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def _put(self, rule_name, entry, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[rule_name] = entry
+            self._entries.move_to_end(rule_name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, rule_name):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(rule_name, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
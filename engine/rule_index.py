@@ -0,0 +1,201 @@
+import bisect
+import threading
+from engine.ast_builder import Node, flatten_chain
+from engine.dag import SharedRuleSet
+from engine.optimizer import optimize_rule
+
+_RANGE_OPS = ('>', '>=', '<', '<=')
+
+
+class RuleIndex:
+    """Find which of many rules match a record without evaluating them all.
+
+    Each rule is reduced to a set of "cover" operands, at least one of which
+    is true whenever the rule is true: an OR needs all of its children's
+    covers, an AND only the smallest one. The cover operands are indexed per
+    field, equality operands in a hash map and range operands in sorted
+    threshold lists. For a record the index finds the true cover operands,
+    and only the rules they belong to (plus rules that cannot be indexed)
+    are evaluated, over one shared DAG so operands common to several rules
+    run once per record. Rules that raise for a record do not match it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rules = {}          # rule name -> (cover keys or None, version)
+        self._shared = SharedRuleSet()
+        self._always = set()      # rules that must be evaluated for every record
+        self._owners = {}         # cover key -> set of rule names
+        self._equality = {}       # field -> {literal: cover key}
+        self._ranges = {}         # (field, op, literal type) -> (sorted literals, cover keys)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule_name):
+        return rule_name in self._rules
+
+    def rule_names(self):
+        with self._lock:
+            return list(self._rules)
+
+    def version(self, rule_name):
+        entry = self._rules.get(rule_name)
+        return entry[1] if entry is not None else None
+
+    def add_rule(self, rule_name, ast, version=None):
+        # Adding an existing name replaces the old rule
+        # Same optimized tree as cached rules use; the cover is taken from
+        # the tree that actually runs
+        optimized = optimize_rule(ast)
+        cover = _cover(optimized)
+        with self._lock:
+            self.remove_rule(rule_name)
+            self._rules[rule_name] = (cover, version)
+            self._shared.add_rule(rule_name, optimized)
+            if cover is None:
+                self._always.add(rule_name)
+                return
+            for key in cover:
+                owners = self._owners.get(key)
+                if owners is None:
+                    owners = self._owners[key] = set()
+                    self._index_key(key)
+                owners.add(rule_name)
+
+    def remove_rule(self, rule_name):
+        with self._lock:
+            entry = self._rules.pop(rule_name, None)
+            if entry is None:
+                return
+            self._always.discard(rule_name)
+            self._shared.remove_rule(rule_name)
+            cover = entry[0]
+            for key in cover or ():
+                owners = self._owners[key]
+                owners.discard(rule_name)
+                if not owners:
+                    del self._owners[key]
+                    self._unindex_key(key)
+
+    def match(self, data):
+        """Return the sorted names of the rules ``data`` satisfies."""
+        with self._lock:
+            candidates = set(self._always)
+            if isinstance(data, dict):
+                for key in self._true_keys(data):
+                    candidates.update(self._owners[key])
+            results = self._shared.evaluate(data, candidates)
+
+        matches = [rule_name for rule_name, result in results.items()
+                   if result and not isinstance(result, Exception)]
+        matches.sort()
+        return matches
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rules': len(self._rules),
+                'unindexed_rules': len(self._always),
+                'indexed_operands': len(self._owners),
+                'shared_nodes': self._shared.node_count(),
+            }
+
+    def _index_key(self, key):
+        field, op, literal = key
+        if op == '==':
+            self._equality.setdefault(field, {})[literal] = key
+        else:
+            literals, keys = self._ranges.setdefault((field, op, type(literal)), ([], []))
+            position = bisect.bisect_right(literals, literal)
+            literals.insert(position, literal)
+            keys.insert(position, key)
+
+    def _unindex_key(self, key):
+        field, op, literal = key
+        if op == '==':
+            del self._equality[field][literal]
+            if not self._equality[field]:
+                del self._equality[field]
+        else:
+            literals, keys = self._ranges[(field, op, type(literal))]
+            position = keys.index(key, bisect.bisect_left(literals, literal))
+            del literals[position]
+            del keys[position]
+            if not literals:
+                del self._ranges[(field, op, type(literal))]
+
+    def _true_keys(self, data):
+        # Cover operands that are true for `data`, found without scanning
+        for field, value in data.items():
+            if value is None:
+                continue
+            # Convert value to int if it's numeric, as `evaluate` does
+            if isinstance(value, str) and value.isdigit():
+                try:
+                    value = int(value)
+                except ValueError:
+                    continue
+
+            if isinstance(value, str):
+                literal_type = str
+            elif type(value) in (int, float, bool):
+                if value != value:  # NaN compares false with everything
+                    continue
+                literal_type = int
+            else:
+                continue  # other types raise when compared
+
+            key = self._equality.get(field, {}).get(value)
+            if key is not None:
+                yield key
+
+            for op in _RANGE_OPS:
+                thresholds = self._ranges.get((field, op, literal_type))
+                if thresholds is None:
+                    continue
+                literals, keys = thresholds
+                # literals is sorted, so the true operands are a prefix
+                # (value > / >= literal) or a suffix (value < / <= literal)
+                if op == '>':
+                    yield from keys[:bisect.bisect_left(literals, value)]
+                elif op == '>=':
+                    yield from keys[:bisect.bisect_right(literals, value)]
+                elif op == '<':
+                    yield from keys[bisect.bisect_right(literals, value):]
+                else:
+                    yield from keys[bisect.bisect_left(literals, value):]
+
+
+def _cover(ast):
+    # Set of operand keys one of which is true whenever `ast` is true; an
+    # empty set means `ast` is never true and None that it cannot be indexed
+    if not isinstance(ast, Node):
+        return set()  # a missing child always raises
+    if ast.node_type == 'operand':
+        try:
+            field, op, literal = ast.parsed_operand()
+        except Exception:
+            return set()  # invalid operands always raise
+        if op == '!=':
+            return None
+        return {(field, op, literal)}
+    elif ast.node_type == 'constant':
+        return None if ast.value else set()
+    elif ast.node_type == 'operator':
+        if ast.value == 'OR':
+            cover = set()
+            for child in flatten_chain(ast):
+                child_cover = _cover(child)
+                if child_cover is None:
+                    return None
+                cover |= child_cover
+            return cover
+        elif ast.value == 'AND':
+            best = None
+            for child in flatten_chain(ast):
+                child_cover = _cover(child)
+                if child_cover is not None and (best is None or len(child_cover) < len(best)):
+                    best = child_cover
+            return best
+    return set()
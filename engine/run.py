@@ -0,0 +1,260 @@
+"""Evaluate rules over a CSV, JSONL or Parquet file, chunk by chunk.
+
+The input is read ``--chunk-size`` rows at a time and every rule is
+evaluated on each chunk (column-wise where possible, see
+engine.vectorized); the output gets one column per rule, true or false,
+empty where the rule raises for the row (e.g. a missing field). Only one
+chunk is held in memory at a time. Throughput is reported on stderr.
+
+    python -m engine.run records.csv results.csv --rule 'senior=age > 60'
+    python -m engine.run records.jsonl results.parquet --rules-file rules.ndjson
+    python -m engine.run records.parquet out.csv --rule-id r1 --sqlite rules.db --keep id
+
+Rules come from ``--rule NAME=RULE`` (repeatable), an NDJSON or JSON rules
+file such as the output of ``python -m db.bulk export``, or ``--rule-id``
+names loaded from the rule store (``--sqlite PATH`` for an SQLite file,
+otherwise the configured store).
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+import pandas as pd
+from engine.ast_builder import create_rule
+from engine.compiler import compile_rule
+from engine.parallel import parse_rule_dict
+from engine.vectorized import evaluate_frame
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet', '.pq': 'parquet'}
+_NAMED_RULE = re.compile(r'(\w+)=(?!=)(.*)', re.DOTALL)
+
+
+def evaluate_chunk(rules, df):
+    """One nullable boolean column per rule for the rows of ``df``.
+
+    ``rules`` maps names to ASTs. Missing values count as missing fields,
+    so rules reading them are null for that row, as /evaluate_rule would
+    report an error. A rule is evaluated column-wise unless it raises for
+    some row; then it runs row by row so only those rows are null.
+    """
+    df = missing_as_none(df)
+    records = None
+    columns = {}
+    for rule_name, ast in rules.items():
+        try:
+            values = evaluate_frame(ast, df)
+        except Exception:
+            if records is None:
+                records = df.to_dict('records')
+            predicate = compile_rule(ast)
+            values = [_row_result(predicate, record) for record in records]
+        columns[rule_name] = pd.array(values, dtype='boolean')
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _row_result(predicate, record):
+    try:
+        return bool(predicate(record))
+    except Exception:
+        return None
+
+
+def missing_as_none(df):
+    # Readers give NaN for empty cells; records sent to the API have no value
+    # there at all
+    missing = [column for column in df.columns if df[column].hasnans]
+    if not missing:
+        return df
+    df = df.copy()
+    for column in missing:
+        df[column] = df[column].astype(object).where(df[column].notna(), None)
+    return df
+
+
+def file_format(path, given=None):
+    if given:
+        return given
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _EXTENSIONS:
+        raise ValueError(f"Cannot tell the format of {path}; pass --input-format/--output-format")
+    return _EXTENSIONS[extension]
+
+
+def read_chunks(path, chunk_size, fmt):
+    # DataFrames of at most chunk_size rows, in file order
+    if fmt == 'csv':
+        with pd.read_csv(path, chunksize=chunk_size) as reader:
+            yield from reader
+    elif fmt == 'jsonl':
+        with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False) as reader:
+            yield from reader
+    else:
+        parquet = _pyarrow_parquet()
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV, JSONL or Parquet file."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._parquet = None
+
+    def write(self, df):
+        if self.fmt == 'parquet':
+            parquet = _pyarrow_parquet()
+            import pyarrow
+            schema = self._parquet.schema if self._parquet is not None else None
+            table = pyarrow.Table.from_pandas(df, schema=schema, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = parquet.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+            return
+        first = self._file is None
+        if first:
+            self._file = open(self.path, 'w', newline='')
+        if self.fmt == 'csv':
+            df.to_csv(self._file, header=first, index=False)
+        elif len(df):
+            df.to_json(self._file, orient='records', lines=True)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self._file is not None:
+            self._file.close()
+
+
+def load_rules(inline=(), rules_file=None, rule_ids=(), sqlite_path=None):
+    """``{rule_name: ast}`` from inline rule strings (``NAME=RULE`` or just
+    ``RULE``), a rules file and stored rule names, in that order."""
+    rules = {}
+    for index, text in enumerate(inline):
+        match = _NAMED_RULE.fullmatch(text)
+        rule_name, rule_string = (match.group(1), match.group(2)) if match else (f'rule_{index + 1}', text)
+        rules[rule_name] = create_rule(rule_string)
+
+    if rules_file:
+        with open(rules_file) as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            # {"rules": [...]}, a list of entries, or a single entry (a
+            # one-line NDJSON file)
+            if isinstance(data, dict):
+                entries = data['rules'] if 'rules' in data else [data]
+            else:
+                entries = data
+        for entry in entries:
+            # Exported rules are built from their AST: the rule strings of
+            # combined rules may not parse
+            if entry.get('ast') is not None:
+                rules[entry['rule_name']] = parse_rule_dict(entry['ast'])
+            else:
+                rules[entry['rule_name']] = create_rule(entry.get('rule', entry.get('rule_string')))
+
+    if rule_ids:
+        from db.models import SQLiteRuleStore, retrieve_rule_version, set_rule_store
+        if sqlite_path:
+            set_rule_store(SQLiteRuleStore(sqlite_path))
+        for rule_name in rule_ids:
+            loaded = retrieve_rule_version(rule_name)
+            if loaded is None:
+                raise LookupError(f"Rule '{rule_name}' not found in the rule store")
+            rules[rule_name] = loaded[0]
+    return rules
+
+
+def run(input_path, output_path, rules, chunk_size=50_000, input_format=None, output_format=None,
+        keep=(), progress=sys.stderr, progress_interval=1.0):
+    """Evaluate ``rules`` over the input file and write the results;
+    returns ``(rows, {rule_name: rows the rule raised for})``."""
+    input_format = file_format(input_path, input_format)
+    output_format = file_format(output_path, output_format)
+    clashes = set(keep) & set(rules)
+    if clashes:
+        raise ValueError(f"Kept columns clash with rule names: {', '.join(sorted(clashes))}")
+
+    writer = ChunkWriter(output_path, output_format)
+    errors = dict.fromkeys(rules, 0)
+    rows = 0
+    start = last_report = time.perf_counter()
+    try:
+        for chunk in read_chunks(input_path, chunk_size, input_format):
+            results = evaluate_chunk(rules, chunk)
+            for rule_name in rules:
+                errors[rule_name] += int(results[rule_name].isna().sum())
+            if keep:
+                missing = [column for column in keep if column not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Input has no column {missing[0]!r} to keep")
+                results = pd.concat([chunk[list(keep)], results], axis=1)
+            writer.write(results)
+            rows += len(chunk)
+            now = time.perf_counter()
+            if progress is not None and now - last_report >= progress_interval:
+                print(f"{rows:,} rows, {rows / (now - start):,.0f} rows/s", file=progress)
+                last_report = now
+        if rows == 0:
+            # An empty input still leaves an (empty) output file
+            open(output_path, 'w').close()
+    finally:
+        writer.close()
+
+    if progress is not None:
+        elapsed = time.perf_counter() - start
+        rate = rows / elapsed if elapsed > 0 else math.inf
+        print(f"done: {rows:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=progress)
+        for rule_name, count in errors.items():
+            if count:
+                print(f"{rule_name}: {count:,} rows could not be evaluated", file=progress)
+    return rows, errors
+
+
+def _pyarrow_parquet():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow)") from None
+    return pyarrow.parquet
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--rule', action='append', default=[], help='inline rule, NAME=RULE or just RULE (repeatable)')
+    parser.add_argument('--rules-file', help='NDJSON or JSON file of {"rule_name": ..., "rule": ...} objects')
+    parser.add_argument('--rule-id', action='append', default=[], help='name of a stored rule (repeatable)')
+    parser.add_argument('--sqlite', help='SQLite rule store file for --rule-id (default: the configured store)')
+    parser.add_argument('--keep', action='append', default=[], help='input column to copy to the output, e.g. an id (repeatable)')
+    parser.add_argument('--chunk-size', type=int, default=50_000, help='rows per chunk (default 50000)')
+    parser.add_argument('--input-format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--output-format', choices=FORMATS, help='default: from the file extension')
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+
+    try:
+        rules = load_rules(args.rule, args.rules_file, args.rule_id, args.sqlite)
+        if not rules:
+            parser.error('no rules given; use --rule, --rules-file or --rule-id')
+        run(args.input, args.output, rules, args.chunk_size, args.input_format, args.output_format, args.keep)
+    except (OSError, ValueError, LookupError, RuntimeError, SyntaxError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
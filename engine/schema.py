@@ -0,0 +1,201 @@
+import json
+import re
+from engine.ast_builder import post_order
+
+FIELD_TYPES = ('int', 'float', 'str', 'bool')
+
+_INTEGER = re.compile(r'-?[0-9]+')
+_BOOLEANS = {'true': True, 'false': False}
+
+
+class SchemaError(ValueError):
+    """A record or rule does not fit a schema; ``errors`` lists every problem."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class Field:
+    __slots__ = ('name', 'type', 'required')
+
+    def __init__(self, name, type, required=True):
+        if type not in FIELD_TYPES:
+            raise ValueError(f"Field '{name}': unknown type {type!r}, expected one of {', '.join(FIELD_TYPES)}")
+        self.name = name
+        self.type = type
+        self.required = required
+
+    def to_dict(self):
+        return {'type': self.type, 'required': self.required}
+
+
+class Schema:
+    """The fields the rules of a rule set may reference, with their types.
+
+    ``decode(record)`` checks and coerces a record once, before any rule
+    runs: required fields must be present, numeric strings become numbers
+    and values of the wrong type are rejected, with every problem listed in
+    a ``SchemaError``. Fields not in the schema pass through unchanged.
+    ``rule_errors`` lists what would make a rule invalid for the schema.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = {field.name: field for field in fields}
+        self.decode = self._compile_decoder()
+
+    @classmethod
+    def from_dict(cls, name, data):
+        # {"fields": {"age": {"type": "int", "required": true}, ...}}
+        fields = data.get('fields') if isinstance(data, dict) else None
+        if not isinstance(fields, dict) or not fields:
+            raise ValueError(f"Schema '{name}' must have a non-empty 'fields' object")
+        return cls(name, [
+            Field(field_name, spec.get('type'), spec.get('required', True))
+            for field_name, spec in fields.items()
+        ])
+
+    def to_dict(self):
+        return {'fields': {name: field.to_dict() for name, field in self.fields.items()}}
+
+    @property
+    def required(self):
+        return [name for name, field in self.fields.items() if field.required]
+
+    def comparable(self, field_name, literal):
+        # True if the field is in the schema and its decoded values can be
+        # compared with the literal as engine.evaluator.evaluate compares
+        # them; bool fields compare with 0 and 1, not with strings
+        field = self.fields.get(field_name)
+        if field is None:
+            return False
+        if field.type == 'str':
+            return isinstance(literal, str)
+        return isinstance(literal, int)
+
+    def rule_errors(self, ast):
+        errors = []
+        for node in post_order(ast):
+            if node.node_type != 'operand':
+                continue
+            try:
+                field_name, op, literal = node.parsed_operand()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            field = self.fields.get(field_name)
+            if field is None:
+                errors.append(f"Unknown field '{field_name}' in '{node.value}'")
+            elif not self.comparable(field_name, literal):
+                errors.append(f"Field '{field_name}' is {field.type} and cannot be compared with {literal!r}")
+        return errors
+
+    def check_rule(self, ast):
+        errors = self.rule_errors(ast)
+        if errors:
+            raise SchemaError(errors)
+
+    def _compile_decoder(self):
+        # One (name, coerce, required, type) entry per field, resolved here so
+        # decoding is a single loop of direct calls
+        plan = [(name, _COERCERS[field.type], field.required, field.type)
+                for name, field in self.fields.items()]
+
+        def decode(record):
+            if not isinstance(record, dict):
+                raise SchemaError(['Record must be a JSON object'])
+            decoded = dict(record)
+            errors = None
+            for name, coerce, required, type_name in plan:
+                value = record.get(name)
+                if value is None:
+                    if required:
+                        errors = errors or []
+                        errors.append(f"Missing required field '{name}'")
+                    continue
+                try:
+                    decoded[name] = coerce(value)
+                except (TypeError, ValueError):
+                    errors = errors or []
+                    errors.append(f"Field '{name}' must be {type_name}, got {value!r}")
+            if errors:
+                raise SchemaError(errors)
+            return decoded
+
+        return decode
+
+
+def _to_int(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, str) and _INTEGER.fullmatch(value):
+        return int(value)
+    if type(value) is float and value.is_integer():
+        return int(value)
+    raise TypeError
+
+
+def _to_float(value):
+    if type(value) in (int, float):
+        return value
+    if isinstance(value, str):
+        return int(value) if _INTEGER.fullmatch(value) else float(value)
+    raise TypeError
+
+
+def _to_str(value):
+    if isinstance(value, str):
+        return value
+    raise TypeError
+
+
+def _to_bool(value):
+    if type(value) is bool:
+        return value
+    if isinstance(value, str) and value.lower() in _BOOLEANS:
+        return _BOOLEANS[value.lower()]
+    raise TypeError
+
+
+_COERCERS = {'int': _to_int, 'float': _to_float, 'str': _to_str, 'bool': _to_bool}
+
+# The fields the API required before schemas existed; numbers may be ints
+# or floats, as they could then
+DEFAULT_SCHEMA = {
+    'fields': {
+        'age': {'type': 'float'},
+        'income': {'type': 'float'},
+        'department': {'type': 'str'},
+    }
+}
+
+
+class SchemaRegistry:
+    """Named schemas; the one called "default" is used when none is given."""
+
+    def __init__(self, schemas=None):
+        self._schemas = {}
+        for name, data in (schemas or {'default': DEFAULT_SCHEMA}).items():
+            self.add(name, data)
+        if 'default' not in self._schemas:
+            self.add('default', DEFAULT_SCHEMA)
+
+    @classmethod
+    def from_file(cls, path):
+        # JSON file mapping schema names to {"fields": {...}}
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def add(self, name, data):
+        # Register (or replace) the schema called `name`
+        self._schemas[name] = Schema.from_dict(name, data)
+
+    def get(self, name=None):
+        return self._schemas.get(name or 'default')
+
+    def names(self):
+        return sorted(self._schemas)
+
+    def to_dict(self):
+        return {name: schema.to_dict() for name, schema in self._schemas.items()}
@@ -0,0 +1,194 @@
+from engine.ast_builder import Node, post_order
+
+# Column kinds understood by the compiler. 'number' and 'bool' columns hold
+# Python numbers, 'text' columns strings; anything else (dates, JSON, blobs,
+# ...) cannot be compared with a rule literal.
+COLUMN_KINDS = ('number', 'bool', 'text', 'other')
+
+DIALECTS = ('postgres', 'sqlite')
+
+_SQL_OPERATORS = {'>': '>', '<': '<', '==': '=', '!=': '<>', '>=': '>=', '<=': '<='}
+
+# Evaluation states: the rule is false, true, or `evaluate` would raise
+_FALSE, _TRUE, _ERROR = 0, 1, 2
+
+# Fragments are (sql, params) pairs; params follow the placeholders in order
+_ALWAYS = ('1 = 1', ())
+_NEVER = ('1 = 0', ())
+
+
+def compile_where(ast, columns, dialect):
+    """Compile a rule AST into a parameterized SQL predicate.
+
+    ``columns`` maps each column of the target table to one of
+    ``COLUMN_KINDS``. The predicate holds for exactly the rows on which
+    ``evaluate`` returns True when the row is passed as a dict of its
+    columns, including the coercion of digit strings to int; rows it would
+    raise on (missing or NULL fields, ordering a string against a number,
+    malformed operands) do not match. Returns ``(sql, params)``; every rule
+    literal is bound as a parameter.
+
+    The predicate is a plain condition the database can use indexes for,
+    ANDed with an exact per-row check that reproduces the short-circuit
+    evaluation of ``evaluate``.
+    """
+    state, hint = _compile(ast, columns, dialect)
+    return _and(hint, _join('(', state, f') = {_TRUE}'))
+
+
+def compile_errors(ast, columns, dialect):
+    # Predicate for the rows `evaluate` would raise on
+    state, _ = _compile(ast, columns, dialect)
+    return _join('(', state, f') = {_ERROR}')
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _compile(ast, columns, dialect):
+    # (state, hint) fragments for the root: `state` evaluates to 0/1/2 per
+    # row, `hint` is a condition every row with state 1 satisfies
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unsupported SQL dialect: {dialect}")
+    if not isinstance(ast, Node):
+        return _constant(_ERROR), _NEVER
+
+    compiled = {}
+    for node in post_order(ast):
+        compiled[id(node)] = _compile_node(node, compiled, columns, dialect)
+    return compiled[id(ast)]
+
+
+def _compile_node(node, compiled, columns, dialect):
+    if node.node_type == 'operator':
+        left = _child(node.left, compiled)
+        right = _child(node.right, compiled)
+        if node.value == 'AND':
+            # Right side only when the left is true, as in `evaluate`
+            state = _join('CASE ', left[0], f' WHEN {_TRUE} THEN ', right[0],
+                          f' WHEN {_FALSE} THEN {_FALSE} ELSE {_ERROR} END')
+            return state, _and(left[1], right[1])
+        elif node.value == 'OR':
+            state = _join('CASE ', left[0], f' WHEN {_FALSE} THEN ', right[0],
+                          f' WHEN {_TRUE} THEN {_TRUE} ELSE {_ERROR} END')
+            return state, _or(left[1], right[1])
+        return _constant(_FALSE), _NEVER
+
+    elif node.node_type == 'constant':
+        if node.value:
+            return _constant(_TRUE), _ALWAYS
+        return _constant(_FALSE), _NEVER
+
+    elif node.node_type == 'operand':
+        try:
+            field, op, literal = node.parsed_operand()
+        except Exception:
+            return _constant(_ERROR), _NEVER
+        if field not in columns:
+            # data.get(field) is None for every row
+            return _constant(_ERROR), _NEVER
+        if dialect == 'postgres':
+            return _postgres_operand(field, columns[field], op, literal)
+        return _sqlite_operand(field, columns[field], op, literal)
+
+    return _constant(_FALSE), _NEVER
+
+
+def _child(node, compiled):
+    if isinstance(node, Node):
+        return compiled[id(node)]
+    # evaluate(None) raises
+    return _constant(_ERROR), _NEVER
+
+
+def _postgres_operand(field, kind, op, literal):
+    column = quote_identifier(field)
+    sql_op = _SQL_OPERATORS[op]
+    if isinstance(literal, int):
+        if kind in ('number', 'bool'):
+            value = f'{column}::int' if kind == 'bool' else column
+            return (_join(f'CASE WHEN {column} IS NULL THEN {_ERROR} ELSE ',
+                          _case_compare(f'{value} {sql_op} %s', literal), ' END'),
+                    (f'{value} {sql_op} %s', (literal,)))
+        if kind == 'text':
+            # Digit strings are compared as numbers, other strings cannot
+            # be compared with a number
+            return (_join(f"CASE WHEN {column} ~ '^[0-9]+$' THEN ",
+                          _case_compare(f'{column}::numeric {sql_op} %s', literal),
+                          f' ELSE {_ERROR} END'),
+                    _ALWAYS)
+    else:
+        if kind == 'text':
+            hint = (f'{column} = %s', (literal,)) if op == '==' else _ALWAYS
+            return (_join(f"CASE WHEN {column} IS NULL OR {column} ~ '^[0-9]+$' THEN {_ERROR} ELSE ",
+                          _case_compare(f'{column}::text COLLATE "C" {sql_op} %s', literal), ' END'),
+                    hint)
+    # compare_all computes every operator, so values of different types
+    # raise even for == and !=
+    return _constant(_ERROR), _NEVER
+
+
+def _sqlite_operand(field, kind, op, literal):
+    # SQLite columns can hold any type, so the check dispatches on typeof()
+    # per row; `kind` (the declared affinity) only decides the hint
+    column = quote_identifier(field)
+    sql_op = _SQL_OPERATORS[op]
+    # Values of different types raise, see _postgres_operand
+    mismatch = _constant(_ERROR)
+    if isinstance(literal, int):
+        numeric = _case_compare(f'{column} {sql_op} ?', literal)
+        digits = _case_compare(f'CAST({column} AS INTEGER) {sql_op} ?', literal)
+        text = mismatch
+        # Numeric affinity columns store digit strings as numbers
+        hint = (f'{column} {sql_op} ?', (literal,)) if kind == 'number' else _ALWAYS
+    else:
+        numeric = mismatch
+        digits = mismatch
+        text = _case_compare(f'CAST({column} AS TEXT) COLLATE BINARY {sql_op} ?', literal)
+        hint = (f'{column} = ?', (literal,)) if kind == 'text' and op == '==' else _ALWAYS
+    state = _join(f"CASE typeof({column}) WHEN 'null' THEN {_ERROR} WHEN 'integer' THEN ", numeric,
+                  " WHEN 'real' THEN ", numeric,
+                  f" WHEN 'text' THEN CASE WHEN {column} <> '' AND {column} NOT GLOB '*[^0-9]*' THEN ",
+                  digits, ' ELSE ', text, ' END ELSE ', mismatch, ' END')
+    return state, hint
+
+
+def _case_compare(condition, literal):
+    return (f'CASE WHEN {condition} THEN {_TRUE} ELSE {_FALSE} END', (literal,))
+
+
+def _constant(state):
+    return str(state), ()
+
+
+def _join(*parts):
+    sql = []
+    params = []
+    for part in parts:
+        if isinstance(part, str):
+            sql.append(part)
+        else:
+            sql.append(part[0])
+            params.extend(part[1])
+    return ''.join(sql), tuple(params)
+
+
+def _and(left, right):
+    if left is _NEVER or right is _NEVER:
+        return _NEVER
+    if left is _ALWAYS:
+        return right
+    if right is _ALWAYS:
+        return left
+    return _join('(', left, ') AND (', right, ')')
+
+
+def _or(left, right):
+    if left is _ALWAYS or right is _ALWAYS:
+        return _ALWAYS
+    if left is _NEVER:
+        return right
+    if right is _NEVER:
+        return left
+    return _join('(', left, ') OR (', right, ')')
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from engine.evaluator import evaluate
+from engine.compiler import compile_rule, _COMPARATORS
+
+
+def evaluate_frame(ast, df):
+    """Evaluate a rule AST against every row of a DataFrame at once.
+
+    Each operand becomes a single column-wise comparison and each AND/OR
+    node combines the child masks with ``&``/``|``. Returns a boolean
+    ``np.ndarray`` with one entry per row, in row order. The string to int
+    coercion, short-circuiting and errors raised are the same as for
+    ``evaluate`` on each row as a dict.
+    """
+    return _node_mask(ast, df, np.ones(len(df), dtype=bool))
+
+
+def _node_mask(ast, df, active):
+    # `active` marks the rows whose result is still undecided; rows outside
+    # it are never allowed to raise, mirroring short-circuit evaluation
+    node_type = getattr(ast, 'node_type', None)
+    if node_type == 'operator':
+        if ast.value == 'AND':
+            left_mask = _node_mask(ast.left, df, active)
+            return left_mask & _node_mask(ast.right, df, active & left_mask)
+        elif ast.value == 'OR':
+            left_mask = _node_mask(ast.left, df, active)
+            return left_mask | _node_mask(ast.right, df, active & ~left_mask)
+        return np.zeros(len(df), dtype=bool)
+
+    elif node_type == 'operand':
+        if not active.any():
+            return np.zeros(len(df), dtype=bool)
+        return _operand_mask(ast, df, active)
+
+    elif node_type == 'constant':
+        return np.full(len(df), bool(ast.value), dtype=bool)
+
+    # Missing children raise and unknown node types are False, as in `evaluate`
+    if active.any():
+        evaluate(ast, {})
+    return np.zeros(len(df), dtype=bool)
+
+
+def _operand_mask(ast, df, active):
+    try:
+        field, op, literal = ast.parsed_operand()
+        if field not in df.columns:
+            raise ValueError(f"{field} is missing from the input data")
+    except Exception as e:
+        raise ValueError(f"Evaluation error: {str(e)}")
+
+    column = df[field]
+    if active.all():
+        values = _coerce_column(column, literal)
+    else:
+        values = _coerce_column(column[active], literal)
+    if values is None:
+        return _row_mask(ast, field, column, active)
+    mask = np.zeros(len(df), dtype=bool)
+    mask[active] = np.asarray(_COMPARATORS[op](values, literal), dtype=bool)
+    return mask
+
+
+def _coerce_column(column, literal):
+    # Return the column as an array that compares against `literal` exactly
+    # like the per-row path would, or None when the column needs row-by-row
+    # handling (nulls, mixed types, values that make the comparison raise)
+    kind = pd.api.types.infer_dtype(column, skipna=False)
+
+    if kind in ('integer', 'floating', 'boolean'):
+        if isinstance(literal, str):
+            return None
+        return column.to_numpy()
+
+    if kind == 'string' and not column.hasnans:
+        digits = column.str.isdigit().to_numpy()
+        if isinstance(literal, str):
+            # Digit strings become ints, which cannot be compared to text
+            if digits.any():
+                return None
+            return column.to_numpy(dtype=object)
+        if not digits.all():
+            return None
+        try:
+            return column.astype('int64').to_numpy()
+        except (ValueError, OverflowError):
+            return None
+
+    return None
+
+
+def _row_mask(ast, field, column, active):
+    # Slow path: run the compiled operand on each active value so results
+    # and errors match the per-row evaluation exactly
+    predicate = compile_rule(ast)
+    values = column.tolist()
+    mask = np.zeros(len(column), dtype=bool)
+    for position in np.flatnonzero(active):
+        mask[position] = predicate({field: values[position]})
+    return mask
@@ -1,15 +1,78 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox, ttk
 import requests
+import csv
 import json
+import os
+import queue
+import threading
+import time
+import traceback
 
 BASE_URL = "http://127.0.0.1:5000"
+REQUEST_TIMEOUT = 30
+# Records sent per /evaluate_batch request in bulk mode; progress and
+# cancellation are checked between requests
+BULK_CHUNK_SIZE = 500
+
+
+class RequestWorker:
+    """Runs server calls on a background thread over one keep-alive
+    session, and hands their results back to the Tk main loop."""
+
+    def __init__(self, root):
+        self.root = root
+        self.session = requests.Session()
+        self._tasks = queue.Queue()
+        self._done = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+        self.root.after(50, self._deliver)
+
+    def submit(self, task, on_done):
+        # task(session) runs on the worker thread, then on_done(result,
+        # error) on the main loop
+        self._tasks.put((task, on_done))
+
+    def call_soon(self, callback, *args):
+        # Lets a running task update the window (e.g. progress)
+        self._done.put((callback, args))
+
+    def _run(self):
+        while True:
+            task, on_done = self._tasks.get()
+            try:
+                result, error = task(self.session), None
+            except Exception as e:
+                result, error = None, e
+            self._done.put((on_done, (result, error)))
+
+    def _deliver(self):
+        try:
+            while True:
+                try:
+                    callback, args = self._done.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except Exception:
+                    # One failing callback must not stop later deliveries
+                    traceback.print_exc()
+        finally:
+            self.root.after(50, self._deliver)
+
 
 class RuleEngineApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Rule Engine GUI")
 
+        # Server calls run off the main loop so the window stays responsive;
+        # bulk runs get their own worker so other buttons keep working
+        self.worker = RequestWorker(root)
+        self.bulk_worker = RequestWorker(root)
+        self.bulk_cancel = None
+
         # Create a main frame
         self.main_frame = tk.Frame(root)
         self.main_frame.pack()
@@ -75,9 +138,22 @@ class RuleEngineApp:
         self.get_all_rules_button = tk.Button(self.main_frame, text="Get All Rules", command=self.get_all_rules)
         self.get_all_rules_button.grid(row=5, column=0, padx=10, pady=5, sticky='w')
 
+        # Bulk Evaluate
+        self.bulk_frame = tk.Frame(self.main_frame)
+        self.bulk_frame.grid(row=6, column=0, padx=10, pady=5, sticky='w')
+        tk.Label(self.bulk_frame, text="Bulk Evaluate Rule IDs (comma-separated)").pack()
+        self.bulk_rule_ids_entry = tk.Entry(self.bulk_frame, width=50)
+        self.bulk_rule_ids_entry.pack()
+        self.bulk_evaluate_button = tk.Button(self.bulk_frame, text="Evaluate File (JSONL/CSV)", command=self.bulk_evaluate)
+        self.bulk_evaluate_button.pack()
+        self.bulk_progress = ttk.Progressbar(self.bulk_frame, length=300, maximum=100)
+        self.bulk_progress.pack()
+        self.bulk_cancel_button = tk.Button(self.bulk_frame, text="Cancel", state=tk.DISABLED, command=self.cancel_bulk)
+        self.bulk_cancel_button.pack()
+
         # Output
         self.output_frame = tk.Frame(self.main_frame)
-        self.output_frame.grid(row=0, column=1, rowspan=6, padx=10, pady=10, sticky='nsew')
+        self.output_frame.grid(row=0, column=1, rowspan=7, padx=10, pady=10, sticky='nsew')
         self.output_text = tk.Text(self.output_frame, height=20, width=60)
         self.output_text.pack()
 
@@ -85,21 +161,35 @@ class RuleEngineApp:
         self.main_frame.columnconfigure(1, weight=1)
         self.main_frame.rowconfigure(0, weight=1)
 
+    def _request(self, method, path, on_success, **kwargs):
+        # Send a request on the worker; on_success(json) runs on the main loop
+        def task(session):
+            response = session.request(method, f"{BASE_URL}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+            response.raise_for_status()
+            return response.json()
+
+        def done(result, error):
+            if error is not None:
+                self.output_text.insert(tk.END, f"Error: {error}\n")
+            else:
+                on_success(result)
+
+        self.worker.submit(task, done)
+
     def create_rule(self):
         rule_string = self.rule_string_entry.get()
         rule_name = self.rule_name_entry.get()
-        try:
-            response = requests.post(f"{BASE_URL}/create_rule", json={
-                "rule": rule_string,
-                "rule_name": rule_name
-            })
-            response.raise_for_status()
-            self.output_text.insert(tk.END, f"Create Rule Response: {response.json()}\n")
+
+        def done(result):
+            self.output_text.insert(tk.END, f"Create Rule Response: {result}\n")
             # Optionally clear inputs
             self.rule_name_entry.delete(0, tk.END)
             self.rule_string_entry.delete(0, tk.END)
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+
+        self._request("POST", "/create_rule", done, json={
+            "rule": rule_string,
+            "rule_name": rule_name
+        })
 
     def combine_rules(self):
         rule_ids = self.rule_ids_entry.get().split(',')
@@ -108,84 +198,164 @@ class RuleEngineApp:
         if not combined_rule_name:
             self.output_text.insert(tk.END, "Error: Combined rule name is required.\n")
             return
-        try:
-            response = requests.post(f"{BASE_URL}/combine_rules", json={
-                "rules": rule_ids,
-                "combined_rule_name": combined_rule_name
-            })
-            response.raise_for_status()
-            self.output_text.insert(tk.END, f"Combine Rules Response: {response.json()}\n")
+
+        def done(result):
+            self.output_text.insert(tk.END, f"Combine Rules Response: {result}\n")
             # Optionally clear inputs
             self.rule_ids_entry.delete(0, tk.END)
             self.combined_rule_name_entry.delete(0, tk.END)
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+
+        self._request("POST", "/combine_rules", done, json={
+            "rules": rule_ids,
+            "combined_rule_name": combined_rule_name
+        })
 
     def evaluate_rule(self):
-        rule_name = self.rule_name_entry.get()  # Use the correct entry for rule ID
+        rule_id = self.rule_id_entry.get().strip()
         data_json = self.data_entry.get()   # Get JSON data from data entry
 
         try:
-            # Parse the JSON data
-            data = json.loads(data_json)  # This may raise JSONDecodeError
-
-            # Ensure the necessary keys exist
-            if 'age' not in data or 'income' not in data:
-                self.output_text.insert(tk.END, "Error: Missing 'age' or 'income' in data.\n")
-                return
-        
-            # Convert rule_id to integer and validate
-            rule_name = int(rule_name)
-
-            # Send the rule_id and data to the evaluation endpoint
-            response = requests.post(f"{BASE_URL}/evaluate_rule", json={
-                "rule_name": rule_name,
-                "data": data
-            })
-    
-            response.raise_for_status()  # Raise an error for bad responses
-            self.output_text.insert(tk.END, f"Evaluate Rule Response: {response.json()}\n")
-
-        except ValueError as e:
-            self.output_text.insert(tk.END, f"Invalid input: {e}\n")
+            # Parse the JSON data; fields are checked by the server's schema
+            data = json.loads(data_json)
         except json.JSONDecodeError:
             self.output_text.insert(tk.END, "Invalid JSON format. Please check your input.\n")
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+            return
+        if not rule_id:
+            self.output_text.insert(tk.END, "Error: Rule ID is required.\n")
+            return
+
+        def done(result):
+            self.output_text.insert(tk.END, f"Evaluate Rule Response: {result}\n")
+
+        self._request("POST", "/evaluate_rule", done, json={"rule_id": rule_id, "data": data})
 
     def modify_rule(self):
         rule_name = self.modify_rule_id_entry.get()
         new_rule_string = self.new_rule_string_entry.get()
-        try:
-            response = requests.put(f"{BASE_URL}/modify_rule", json={"rule_name": rule_name, "new_rule": new_rule_string})
-            response.raise_for_status()
-            self.output_text.insert(tk.END, f"Modify Rule Response: {response.json()}\n")
+
+        def done(result):
+            self.output_text.insert(tk.END, f"Modify Rule Response: {result}\n")
             # Optionally clear inputs
             self.modify_rule_id_entry.delete(0, tk.END)
             self.new_rule_string_entry.delete(0, tk.END)
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+
+        self._request("PUT", "/modify_rule", done, json={"rule_name": rule_name, "new_rule": new_rule_string})
 
     def delete_rule(self):
         rule_name = self.delete_rule_name_entry.get()
-        try:
-            response = requests.delete(f"{BASE_URL}/delete_rule", json={"rule_name": rule_name})
-            response.raise_for_status()
-            self.output_text.insert(tk.END, f"Delete Rule Response: {response.json()}\n")
+
+        def done(result):
+            self.output_text.insert(tk.END, f"Delete Rule Response: {result}\n")
             # Optionally clear input
             self.delete_rule_name_entry.delete(0, tk.END)
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+
+        self._request("DELETE", "/delete_rule", done, json={"rule_name": rule_name})
 
     def get_all_rules(self):
-        try:
-            response = requests.get(f"{BASE_URL}/get_all_rules")
-            response.raise_for_status()
-            rules = response.json().get("rules", [])
+        def done(result):
+            rules = result.get("rules", [])
             rules_text = "\n".join(rules) if rules else "No rules found."
             self.output_text.insert(tk.END, f"Get All Rules Response:\n{rules_text}\n")
-        except requests.exceptions.RequestException as e:
-            self.output_text.insert(tk.END, f"Error: {e}\n")
+
+        self._request("GET", "/get_all_rules", done)
+
+    def bulk_evaluate(self):
+        rule_ids = [id.strip() for id in self.bulk_rule_ids_entry.get().split(',') if id.strip()]
+        if not rule_ids:
+            self.output_text.insert(tk.END, "Error: At least one rule ID is required.\n")
+            return
+        path = filedialog.askopenfilename(filetypes=[("Records", "*.jsonl *.ndjson *.csv"), ("All files", "*")])
+        if not path:
+            return
+
+        cancel = self.bulk_cancel = threading.Event()
+        self.bulk_evaluate_button.config(state=tk.DISABLED)
+        self.bulk_cancel_button.config(state=tk.NORMAL)
+        self.bulk_progress["value"] = 0
+        self.output_text.insert(tk.END, f"Bulk Evaluate: {os.path.basename(path)} with {', '.join(rule_ids)}\n")
+
+        def task(session):
+            return evaluate_file(session, path, rule_ids, cancel, self._bulk_progress)
+
+        self.bulk_worker.submit(task, self._bulk_done)
+
+    def cancel_bulk(self):
+        if self.bulk_cancel is not None:
+            self.bulk_cancel.set()
+
+    def _bulk_progress(self, percent):
+        # Called on the worker thread; the bar is updated on the main loop
+        self.bulk_worker.call_soon(self.bulk_progress.config, {"value": percent})
+
+    def _bulk_done(self, result, error):
+        self.bulk_evaluate_button.config(state=tk.NORMAL)
+        self.bulk_cancel_button.config(state=tk.DISABLED)
+        if error is not None:
+            self.output_text.insert(tk.END, f"Error: {error}\n")
+            return
+        records, seconds, stats, cancelled = result
+        state = "cancelled after" if cancelled else "done:"
+        self.output_text.insert(tk.END, f"Bulk Evaluate {state} {records} records in {seconds:.2f}s\n")
+        for rule_id, rule_stats in stats.items():
+            evaluated = rule_stats["records"]
+            latency = 1000 * rule_stats["seconds"] / evaluated if evaluated else 0.0
+            self.output_text.insert(
+                tk.END,
+                f"  {rule_id}: {rule_stats['matched']}/{evaluated} matched, {rule_stats['errors']} errors, "
+                f"{latency:.3f} ms/record\n"
+            )
+
+
+def read_records(path):
+    # One JSON line per record; CSV rows become objects without their empty
+    # cells, and the server's schema converts the text values
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                yield json.dumps({key: value for key, value in row.items() if value not in (None, "")}) + "\n"
+    else:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield line if line.endswith("\n") else line + "\n"
+
+
+def evaluate_file(session, path, rule_ids, cancel, progress):
+    """Run every rule over the file's records through /evaluate_batch,
+    BULK_CHUNK_SIZE records per request; returns (records, seconds,
+    {rule_id: counts and time}, cancelled)."""
+    total = sum(1 for _ in read_records(path))
+    stats = {rule_id: {"matched": 0, "errors": 0, "records": 0, "seconds": 0.0} for rule_id in rule_ids}
+    start = time.perf_counter()
+    records = 0
+    lines = read_records(path)
+    while True:
+        chunk = [line for _, line in zip(range(BULK_CHUNK_SIZE), lines)]
+        if not chunk:
+            break
+        body = "".join(chunk).encode("utf-8")
+        for rule_id in rule_ids:
+            if cancel.is_set():
+                return records, time.perf_counter() - start, stats, True
+            sent = time.perf_counter()
+            response = session.post(f"{BASE_URL}/evaluate_batch", params={"rule_id": rule_id}, data=body,
+                                    headers={"Content-Type": "application/x-ndjson"}, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            rule_stats = stats[rule_id]
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                rule_stats["records"] += 1
+                if "error" in result:
+                    rule_stats["errors"] += 1
+                elif result.get("result"):
+                    rule_stats["matched"] += 1
+            rule_stats["seconds"] += time.perf_counter() - sent
+        records += len(chunk)
+        progress(100.0 * records / total)
+    return records, time.perf_counter() - start, stats, False
+
 
 if __name__ == "__main__":
     root = tk.Tk()
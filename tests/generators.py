@@ -0,0 +1,90 @@
+"""Seeded random rules and records for the differential tests.
+
+Unlike bench.synthetic, these are meant to fail: rules reference missing
+fields, compare fields with literals of the wrong type and hold operands
+that do not parse, and records miss fields or hold values of the wrong type.
+"""
+from engine.ast_builder import Node
+
+COMPARISONS = ['>', '<', '>=', '<=', '==', '!=']
+DEPARTMENTS = ['Sales', 'HR', 'Marketing']
+
+# Schema (engine.schema) the generated records are decoded with; "tier" and
+# "active" are optional and "bonus" is not in the schema at all
+SCHEMA = {
+    'fields': {
+        'age': {'type': 'int'},
+        'income': {'type': 'int'},
+        'department': {'type': 'str'},
+        'tier': {'type': 'str', 'required': False},
+        'active': {'type': 'bool', 'required': False},
+    }
+}
+INT_FIELDS = ['age', 'income', 'bonus']
+STR_FIELDS = ['department', 'tier']
+BOOL_LITERALS = ['0', '1', "'True'", "'false'"]
+
+
+def random_operand(rng):
+    roll = rng.random()
+    if roll < 0.03:
+        return Node('operand', value=rng.choice(['age ~ 3', '> 30', 'age >']))
+    if roll < 0.1:
+        # Literal of the wrong type for the field
+        field = rng.choice(INT_FIELDS + STR_FIELDS)
+        literal = rng.choice([f"'{rng.choice(DEPARTMENTS)}'", str(rng.randint(0, 100))])
+    elif roll < 0.2:
+        field = 'active'
+        literal = rng.choice(BOOL_LITERALS)
+    elif rng.random() < 0.5:
+        field = rng.choice(INT_FIELDS)
+        literal = str(rng.randint(0, 100))
+    else:
+        field = rng.choice(STR_FIELDS)
+        literal = f"'{rng.choice(DEPARTMENTS)}'"
+    return Node('operand', value=f'{field} {rng.choice(COMPARISONS)} {literal}')
+
+
+def random_rule(rng, depth=3):
+    roll = rng.random()
+    if depth == 0 or roll < 0.25:
+        if roll < 0.03:
+            return Node('constant', value=rng.random() < 0.5)
+        return random_operand(rng)
+    op = 'AND' if rng.random() < 0.5 else 'OR'
+    return Node('operator', value=op, left=random_rule(rng, depth - 1), right=random_rule(rng, depth - 1))
+
+
+def random_record(rng):
+    record = {}
+    for field in INT_FIELDS:
+        roll = rng.random()
+        if roll < 0.1:
+            continue
+        if roll < 0.15:
+            record[field] = rng.choice(['abc', str(rng.randint(0, 100)), None, 1.5])
+        else:
+            record[field] = rng.randint(0, 100)
+    for field in STR_FIELDS:
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        if roll < 0.2:
+            record[field] = rng.randint(0, 5)
+        elif roll < 0.25:
+            # Digit-only strings, which evaluate reads as numbers
+            record[field] = str(rng.randint(0, 5))
+        else:
+            record[field] = rng.choice(DEPARTMENTS)
+    roll = rng.random()
+    if roll < 0.8:
+        record['active'] = rng.choice([True, False, 'true', 'False'] if roll < 0.7 else ['yes', 1, 0])
+    return record
+
+
+def outcome(predicate, record):
+    # (result, None) or (None, (exception type, message))
+    try:
+        return predicate(record), None
+    except Exception as e:
+        return None, (type(e), str(e))
@@ -0,0 +1,61 @@
+import json
+import pytest
+from db.bulk import export_lines, import_rules, read_entries
+from db.models import SQLiteRuleStore, retrieve_rule, set_rule_store, store_rule
+from engine.ast_builder import combine_rules, create_rule
+from engine.evaluator import evaluate
+from engine.schema import SchemaRegistry
+
+SCHEMA = SchemaRegistry().get()
+
+RULES = ["age > 30 or income > 5", "department == 'Sales'"]
+RECORDS = [
+    {'age': 35, 'income': 0, 'department': 'Sales'},
+    {'age': 20, 'income': 0, 'department': 'Sales'},
+    {'age': 35, 'income': 0, 'department': 'HR'},
+]
+
+
+@pytest.fixture
+def store():
+    set_rule_store(SQLiteRuleStore(':memory:'))
+    yield
+    set_rule_store(SQLiteRuleStore(':memory:'))
+
+
+def round_trip():
+    # Export every rule, then import the export into an empty store
+    lines = list(export_lines())
+    set_rule_store(SQLiteRuleStore(':memory:'))
+    return import_rules(read_entries(lines), workers=1, schema=SCHEMA)
+
+
+def test_combined_rule_survives_export_and_import(store):
+    # Rule strings of rules combined before they were stored as parseable
+    # strings do not parse; the exported AST is used instead
+    combined = combine_rules(RULES)
+    store_rule('combined', ' AND '.join(RULES), combined)
+
+    report, stored = round_trip()
+
+    assert stored and report == {'imported': 1, 'errors': []}
+    imported = retrieve_rule('combined')
+    for record in RECORDS:
+        assert evaluate(imported, record) == evaluate(combined, record)
+
+
+def test_combined_rule_string_parses_to_the_same_rule():
+    combined = combine_rules(RULES)
+    reparsed = create_rule(' and '.join(f'({rule})' for rule in RULES))
+    for record in RECORDS:
+        assert evaluate(reparsed, record) == evaluate(combined, record)
+
+
+def test_import_checks_exported_ast(store):
+    entry = {'rule_name': 'bad', 'rule': 'x', 'ast': {'node_type': 'operand', 'value': 'salary > 5',
+                                                      'left': None, 'right': None}}
+
+    report, stored = import_rules(read_entries([json.dumps(entry)]), workers=1, schema=SCHEMA)
+
+    assert report['imported'] == 0
+    assert [error['rule_name'] for error in report['errors']] == ['bad']
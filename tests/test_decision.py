@@ -0,0 +1,50 @@
+import random
+from engine.ast_builder import Node
+from engine.decision import DecisionDiagram
+from engine.evaluator import evaluate
+from tests.generators import random_operand, random_record
+
+
+def first_match(rules, data):
+    # Reference: evaluate each rule in order; rules that raise do not match
+    for rule_name, ast in rules.items():
+        try:
+            if evaluate(ast, data):
+                return rule_name
+        except Exception:
+            pass
+    return None
+
+
+def random_rules(rng, count, pool_size):
+    # Rules over a shared pool of operands, so atoms recur across rules
+    pool = [random_operand(rng) for _ in range(pool_size)]
+
+    def rule(depth):
+        if depth == 0 or rng.random() < 0.3:
+            if rng.random() < 0.03:
+                return Node('constant', value=rng.random() < 0.5)
+            return rng.choice(pool)
+        op = 'AND' if rng.random() < 0.5 else 'OR'
+        return Node('operator', value=op, left=rule(depth - 1), right=rule(depth - 1))
+
+    return {f'rule_{i}': rule(3) for i in range(count)}
+
+
+def check(seed, max_nodes, compiled):
+    rng = random.Random(seed)
+    for _ in range(20):
+        rules = random_rules(rng, rng.randint(1, 12), rng.randint(2, 10))
+        diagram = DecisionDiagram(rules, max_nodes=max_nodes)
+        assert diagram.compiled is compiled
+        for _ in range(100):
+            record = random_record(rng)
+            assert diagram.classify(record) == first_match(rules, record)
+
+
+def test_diagram_matches_evaluate():
+    check(19, max_nodes=100_000, compiled=True)
+
+
+def test_fallback_matches_evaluate():
+    check(20, max_nodes=0, compiled=False)
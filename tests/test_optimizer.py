@@ -0,0 +1,60 @@
+import random
+from engine.ast_builder import create_rule
+from engine.evaluator import evaluate
+from engine.optimizer import optimize_rule
+from engine.rule_cache import PreparedRule
+from engine.schema import Schema, SchemaError
+from tests.generators import SCHEMA, outcome, random_record, random_rule
+
+schema = Schema.from_dict('test', SCHEMA)
+
+
+def test_optional_field_keeps_its_place():
+    # "tier" is optional, so the check on it cannot be moved ahead of
+    # "age > 30", which decides the rule for this record without raising
+    rule = PreparedRule('r', 1, create_rule("age > 30 and tier == 'gold'"))
+    record = schema.decode({'age': 20, 'income': 1, 'department': 'Sales'})
+    assert evaluate(rule.ast, record) is False
+    assert rule(record) is False
+    assert rule.for_schema(schema)(record) is False
+    trace = []
+    assert rule.evaluate_traced(record, trace, schema) is False
+    assert [entry['node'] for entry in trace] == ['age > 30', 'AND']
+
+
+def test_required_fields_are_reordered():
+    ast = create_rule("age > 30 and income == 5")
+    plan = optimize_rule(ast, schema=schema)
+    assert plan.left.value == 'income == 5'
+    # Without a schema any field may be missing
+    assert optimize_rule(ast).left.value == 'age > 30'
+
+
+def test_str_fields_keep_their_place():
+    # evaluate reads the digit-only department as a number, which raises
+    ast = create_rule("age > 30 and department == 'Sales'")
+    plan = optimize_rule(ast, schema=schema)
+    assert plan.left.value == 'age > 30'
+    record = schema.decode({'age': 20, 'income': 1, 'department': '42'})
+    assert outcome(lambda data: evaluate(plan, data), record) == outcome(lambda data: evaluate(ast, data), record)
+
+
+def test_optimized_rules_raise_like_the_original():
+    rng = random.Random(6)
+    checked = 0
+    for _ in range(300):
+        ast = random_rule(rng)
+        plain = optimize_rule(ast)
+        typed = optimize_rule(ast, schema=schema)
+        for _ in range(30):
+            record = random_record(rng)
+            expected = outcome(lambda data: evaluate(ast, data), record)
+            assert outcome(lambda data: evaluate(plain, data), record) == expected
+            try:
+                decoded = schema.decode(record)
+            except SchemaError:
+                continue
+            assert outcome(lambda data: evaluate(typed, data), decoded) == \
+                outcome(lambda data: evaluate(ast, data), decoded)
+            checked += 1
+    assert checked > 1000
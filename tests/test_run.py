@@ -0,0 +1,36 @@
+import json
+from engine.ast_builder import combine_rules, serialize_ast
+from engine.evaluator import evaluate
+from engine.run import load_rules
+
+RULES = ["age > 30 or income > 5", "department == 'Sales'"]
+RECORDS = [
+    {'age': 35, 'income': 0, 'department': 'Sales'},
+    {'age': 20, 'income': 0, 'department': 'Sales'},
+    {'age': 35, 'income': 0, 'department': 'HR'},
+]
+
+
+def test_rules_file_with_one_entry(tmp_path):
+    path = tmp_path / 'one.ndjson'
+    path.write_text(json.dumps({'rule_name': 'senior', 'rule': 'age > 60'}) + '\n')
+
+    rules = load_rules(rules_file=str(path))
+
+    assert list(rules) == ['senior']
+    assert evaluate(rules['senior'], {'age': 61})
+
+
+def test_rules_file_with_exported_combined_rule(tmp_path):
+    # As written by db.bulk export for a rule stored before combined rule
+    # strings were made parseable
+    combined = combine_rules(RULES)
+    entry = {'rule_name': 'combined', 'rule': ' AND '.join(RULES), 'ast': serialize_ast(combined), 'version': 1}
+    path = tmp_path / 'export.ndjson'
+    path.write_text(json.dumps(entry) + '\n' + json.dumps({'rule_name': 'young', 'rule': 'age < 30'}) + '\n')
+
+    rules = load_rules(rules_file=str(path))
+
+    assert list(rules) == ['combined', 'young']
+    for record in RECORDS:
+        assert evaluate(rules['combined'], record) == evaluate(combined, record)
@@ -0,0 +1,19 @@
+from engine.ast_builder import create_rule
+from engine.evaluator import evaluate
+from engine.rule_cache import PreparedRule
+from engine.schema import SchemaRegistry
+
+schema = SchemaRegistry().get()
+
+
+def test_default_schema_takes_float_numbers():
+    rule = PreparedRule('r', 1, create_rule("age > 30 and income > 1 and department == 'Sales'"))
+    for income, expected in ((1.5, True), (0.5, False), (2, True), ('1.5', True), ('2', True)):
+        record = schema.decode({'age': 35, 'department': 'Sales', 'income': income})
+        assert rule.for_schema(schema)(record) is expected
+        assert evaluate(rule.ast, record) is expected
+
+
+def test_default_schema_keeps_integer_strings_integers():
+    assert schema.decode({'age': '40', 'income': '1.5', 'department': 'HR'}) == \
+        {'age': 40, 'income': 1.5, 'department': 'HR'}